@@ -0,0 +1,66 @@
+"""
+combining sets of knowsys items: python sets of items (as before) vs `KnowsysBitset` over the dense ids.
+
+    python benchmarks/bench_bitset.py --items 1000000 --repeat 20
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from knowsys.bitset import KnowsysBitset
+from knowsys.collection import knowsys_collection
+from knowsys.types import EntityType, EntityTermType
+
+
+def synthetic_items(items: int):
+    knowsys_collection.clear()
+    category = EntityType('category', 'category')
+    knowsys_collection.bulk_add(EntityTermType, {'code': [f'{i:016x}' for i in range(items)],
+                                                 'name': [f'term_{i}' for i in range(items)],
+                                                 'belong_to': [category] * items})
+
+
+def timed(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--density', type=float, default=0.3, help='the share of the items in each set')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    synthetic_items(args.items)
+    rng = np.random.default_rng(0)
+    ids = [np.flatnonzero(rng.random(len(knowsys_collection)) < args.density) for _ in range(3)]
+    sets = [{knowsys_collection.data[i] for i in s} for s in ids]
+    bitsets = [KnowsysBitset.from_ids(knowsys_collection, s) for s in ids]
+    probes = [knowsys_collection.data[i] for i in rng.integers(0, len(knowsys_collection), 10_000)]
+
+    a, b, c = sets
+    x, y, z = bitsets
+    assert len((a | b) & c) == len((x | y) & z) and len(a - b) == len(x - y)
+    assert x.contains_many(probes).tolist() == [p in a for p in probes]
+    cases = [
+        ('(a | b) & c', lambda: len((a | b) & c), lambda: len((x | y) & z)),
+        ('a - b', lambda: len(a - b), lambda: len(x - y)),
+        ('count', lambda: len(a), lambda: len(x)),
+        ('10k membership tests', lambda: [p in a for p in probes], lambda: [p in x for p in probes]),
+        ('10k membership tests, vectorized', lambda: [p in a for p in probes], lambda: x.contains_many(probes)),
+    ]
+
+    print(f'items: {len(knowsys_collection)}, set sizes: {[len(s) for s in sets]}')
+    for name, on_sets, on_bitsets in cases:
+        before, after = timed(on_sets, args.repeat), timed(on_bitsets, args.repeat)
+        print(f'{name}: sets {before * 1e3:.2f}ms, bitsets {after * 1e3:.3f}ms ({before / after:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
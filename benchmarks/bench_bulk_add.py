@@ -0,0 +1,86 @@
+"""
+per-row construction (`data.iloc` + constructors) vs `KnowsysCollection.bulk_add` on a synthetic term table.
+
+    python benchmarks/bench_bulk_add.py --rows 1000000
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from knowsys.collection import knowsys_collection
+from knowsys.types import EntityType, EntityTermType
+
+
+def synthetic_terms(rows: int, categories: int = 100, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    codes = np.array([f'{i:016x}' for i in range(rows)], dtype=object)
+    # a forest: every term is a root or the child of an earlier term
+    parents = rng.integers(-1, np.maximum(np.arange(rows), 1))
+    parents[parents >= np.arange(rows)] = -1
+    return pd.DataFrame({
+        'entity_code': codes,
+        'entity_name': [f'term_{i}' for i in range(rows)],
+        'parent_entity_code': np.where(parents >= 0, codes[np.maximum(parents, 0)], None),
+        'category_code': [f'category_{i}' for i in rng.integers(0, categories, rows)],
+    })
+
+
+def init_categories(categories: int = 100):
+    knowsys_collection.clear()
+    for i in range(categories):
+        EntityType(f'category_{i}', f'category_{i}')
+
+
+def per_row(data: pd.DataFrame):
+    for item in data.iloc:
+        EntityTermType(item.entity_code, item.entity_name, '',
+                       knowsys_collection.lazy_get(item.parent_entity_code)
+                       if isinstance(item.parent_entity_code, str) else None,
+                       knowsys_collection.lazy_get(item.category_code))
+    knowsys_collection.check_lazy()
+
+
+def bulk(data: pd.DataFrame):
+    knowsys_collection.from_frames([
+        (EntityTermType, pd.DataFrame({'code': data['entity_code'],
+                                       'name': data['entity_name'],
+                                       'name_en': '',
+                                       'parent': data['parent_entity_code'],
+                                       'belong_to': data['category_code']})),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--per-row-rows', type=int, default=100_000,
+                        help='rows used for the (slow) per-row path, its time is extrapolated to --rows')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    data = synthetic_terms(args.rows)
+    per_row_rows = min(args.per_row_rows, args.rows)
+
+    init_categories()
+    start = time.perf_counter()
+    per_row(data.iloc[:per_row_rows])
+    per_row_seconds = (time.perf_counter() - start) * args.rows / per_row_rows
+
+    init_categories()
+    start = time.perf_counter()
+    bulk(data)
+    bulk_seconds = time.perf_counter() - start
+    assert len(knowsys_collection) == args.rows + 100
+
+    print(f'rows: {args.rows}')
+    print(f'per-row: {per_row_seconds:.2f}s ({args.rows / per_row_seconds:,.0f} rows/s)'
+          f'{" (extrapolated from %d rows)" % per_row_rows if per_row_rows < args.rows else ""}')
+    print(f'bulk_add: {bulk_seconds:.2f}s ({args.rows / bulk_seconds:,.0f} rows/s)')
+    print(f'speedup: {per_row_seconds / bulk_seconds:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
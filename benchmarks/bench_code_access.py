@@ -0,0 +1,62 @@
+"""
+repeated `.Code` access on knowsys items: a new `V1Code` parsed on every access (as before) vs the interned one.
+
+    python benchmarks/bench_code_access.py --items 10000 --repeat 50
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from knowsys.code import Code, CODE_DTYPE, V1Code
+from knowsys.collection import knowsys_collection
+from knowsys.types import EntityType
+
+
+def synthetic_codes(items: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    decoded = np.zeros(items, dtype=CODE_DTYPE)
+    decoded['category_type'] = 1
+    decoded['is_property'] = rng.integers(-1, 2, items)
+    decoded['is_group'] = rng.integers(-1, 2, items)
+    decoded['is_term'] = rng.integers(-1, 2, items)
+    decoded['category_id'] = rng.integers(0, 6, items)
+    decoded['relation_id'] = rng.integers(0, 256, items)
+    decoded['property_id'] = np.arange(items) % 4096
+    decoded['extern_l1_id'] = np.arange(items) // 4096 % 256
+    decoded['extern_l2_id'] = np.arange(items) // 4096 // 256
+    return np.unique(Code.encode_many(decoded))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    knowsys_collection.clear()
+    items = [EntityType(str(code), f'entity_{i}') for i, code in enumerate(synthetic_codes(args.items))]
+    accesses = len(items) * args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for item in items:
+            V1Code(item.code).string
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for item in items:
+            item.Code.string
+    after = time.perf_counter() - start
+
+    print(f'items: {len(items)}, accesses: {accesses}')
+    print(f'parsed on every access: {before:.2f}s ({before / accesses * 1e6:.2f}us per access)')
+    print(f'interned: {after:.2f}s ({after / accesses * 1e6:.2f}us per access)')
+    print(f'speedup: {before / after:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+memory of the knowsys nodes: bytes per term node with the attributes in a `__dict__` (the former layout) vs the
+slotted classes, and the rss of a collection of synthetic terms.
+
+    python benchmarks/bench_node_memory.py --rows 1000000
+"""
+import argparse
+import gc
+import logging
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+from knowsys.collection import knowsys_collection
+from knowsys.types import EntityType, EntityTermType
+
+
+class DictTermNode(object):
+    # the attributes of a term, kept in a per-instance `__dict__`
+
+    def __init__(self, code, name, name_en, parent, belong_to):
+        self.code = code
+        self.name = name
+        self.name_en = name_en
+        self.parent = parent
+        self.belong_to = belong_to
+
+
+def slotted_term_node(code, name, name_en, parent, belong_to):
+    res = EntityTermType.__new__(EntityTermType)
+    res.code, res.name, res.name_en, res.parent, res.belong_to = code, name, name_en, parent, belong_to
+    return res
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+def bytes_per_node(factory, rows: int) -> float:
+    # the strings are made before tracing, only the nodes are measured
+    codes = [f'{i:016x}' for i in range(rows)]
+    gc.collect()
+    tracemalloc.start()
+    nodes = [factory(code, 'term', '', None, None) for code in codes]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del nodes
+    # the list holding the nodes is not part of a node
+    return (size - 8 * rows) / rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000, help='terms added to the collection')
+    parser.add_argument('--node-rows', type=int, default=100_000, help='nodes measured by tracemalloc')
+    parser.add_argument('--categories', type=int, default=100)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f'bytes per node, __dict__: {bytes_per_node(DictTermNode, args.node_rows):.0f}')
+    print(f'bytes per node, __slots__: {bytes_per_node(slotted_term_node, args.node_rows):.0f}')
+
+    knowsys_collection.clear()
+    for i in range(args.categories):
+        EntityType(f'category_{i}', f'category_{i}')
+    data = pd.DataFrame({
+        'code': [f'{i:016x}' for i in range(args.rows)],
+        # few distinct names, as in the term tables
+        'name': [f'term_{i % 1000}' for i in range(args.rows)],
+        'name_en': '',
+        'belong_to': [f'category_{i % args.categories}' for i in range(args.rows)],
+    })
+    gc.collect()
+    before = rss_mb()
+    start = time.perf_counter()
+    knowsys_collection.from_frames([(EntityTermType, data)])
+    seconds = time.perf_counter() - start
+    # the frame holds its own copy of every string
+    del data
+    gc.collect()
+    after = rss_mb()
+    print(f'terms: {args.rows}, added in {seconds:.2f}s')
+    print(f'rss: {after:.0f}MB, +{after - before:.0f}MB for the terms '
+          f'({(after - before) * 2 ** 20 / args.rows:.0f} bytes per term with the collection indexes)')
+
+
+if __name__ == '__main__':
+    main()
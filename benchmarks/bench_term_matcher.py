@@ -0,0 +1,97 @@
+"""
+tagging documents with term names: a loop over the names of the collection (as before) vs `TermMatcher`,
+in this process and over a process pool. throughput in MB of utf-8 text per second.
+
+    python benchmarks/bench_term_matcher.py --terms 50000 --docs 200 --workers 4
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from knowsys.collection import knowsys_collection
+from knowsys.matcher import TermMatcher
+from knowsys.types import EntityType, EntityTermType
+
+CHARS = [chr(0x4e00 + i) for i in range(3000)]
+
+
+def random_name(rng: np.random.Generator, low: int, high: int) -> str:
+    return ''.join(CHARS[i] for i in rng.integers(0, len(CHARS), rng.integers(low, high)))
+
+
+def synthetic_terms(terms: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    knowsys_collection.clear()
+    category = EntityType('category', 'category')
+    for i in range(terms):
+        EntityTermType(f'{i:016x}', random_name(rng, 2, 7), '', None, category)
+
+
+def synthetic_docs(docs: int, doc_chars: int, names, seed: int = 1):
+    # about one mention every 20 characters
+    rng = np.random.default_rng(seed)
+    res = []
+    for _ in range(docs):
+        parts, size = [], 0
+        while size < doc_chars:
+            part = names[rng.integers(0, len(names))] if rng.random() < 0.3 else random_name(rng, 5, 20)
+            parts.append(part)
+            size += len(part)
+        res.append(''.join(parts))
+    return res
+
+
+def name_loop(text: str):
+    res = []
+    for name, items in knowsys_collection._name2item.items():
+        start = text.find(name)
+        while start >= 0:
+            res.append(((start, start + len(name)), tuple(items)))
+            start = text.find(name, start + 1)
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--terms', type=int, default=50_000)
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--doc-chars', type=int, default=10_000)
+    parser.add_argument('--loop-docs', type=int, default=5, help='documents tagged by the name loop, it is slow')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    synthetic_terms(args.terms)
+    start = time.perf_counter()
+    matcher = TermMatcher(knowsys_collection)
+    print(f'names: {len(matcher)}, compiled in {time.perf_counter() - start:.2f}s')
+
+    docs = synthetic_docs(args.docs, args.doc_chars, matcher.names)
+    mb = sum(len(doc.encode('utf8')) for doc in docs) / 1e6
+    loop_docs = docs[:args.loop_docs]
+    loop_mb = sum(len(doc.encode('utf8')) for doc in loop_docs) / 1e6
+
+    start = time.perf_counter()
+    for doc in loop_docs:
+        name_loop(doc)
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = [matcher.match(doc) for doc in docs]
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pooled = matcher.match_many(docs, max_workers=args.workers)
+    pool = time.perf_counter() - start
+    assert pooled == matches
+
+    print(f'docs: {len(docs)}, {mb:.1f}MB, {sum(map(len, matches))} matches')
+    print(f'loop over names: {loop_mb / loop:.3f}MB/s ({len(loop_docs)} docs)')
+    print(f'matcher: {mb / single:.2f}MB/s')
+    print(f'matcher, {args.workers} processes: {mb / pool:.2f}MB/s (pool start included)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import os
+import threading
+
+from typing import *
+
+if TYPE_CHECKING:
+    from knowsys.collection import KnowsysCollection
+
+_load_lock = threading.Lock()
+
+
+def load_knowsys(source: Optional[str] = None, cache: Optional[str] = None,
+                 reload: bool = False) -> "KnowsysCollection":
+    """
+    builds the global knowledge system, once, and returns its collection.
+
+    :param source: `files` (the excel files of `cached_data`) or `sql` (the knowsys database),
+                   defaults to `sql` if `KNOWSYS_LOAD_FROM_SQL` is set, else `files`
+    :param cache: a snapshot file written by `KnowsysCollection.save_snapshot`. loaded instead of `source`
+                  if it exists, otherwise written once the collection is built
+    :param reload: clear and build the collection again if it is already loaded
+    """
+    from knowsys.collection import knowsys_collection, KnowsysCollection
+    from knowsys.global_config import configs
+    from knowsys.loader_from_files import bind_roots
+
+    with _load_lock:
+        if len(knowsys_collection) > 0:
+            if not reload:
+                return knowsys_collection
+            knowsys_collection.clear()
+
+        if source is None:
+            source = 'sql' if configs['KNOWSYS_LOAD_FROM_SQL'] else 'files'
+
+        try:
+            if cache is not None and os.path.isfile(cache):
+                KnowsysCollection.load_snapshot(cache).bind(knowsys_collection)
+                bind_roots(knowsys_collection)
+                return knowsys_collection
+
+            if source == 'files':
+                from knowsys.loader_from_files import load_from_files
+                load_from_files()
+            elif source == 'sql':
+                from knowsys.loader import load_from_sql
+                load_from_sql()
+            else:
+                raise ValueError(f'unknown knowsys source `{source}`, expected `files` or `sql`.')
+        except BaseException:
+            # a half-built collection would be returned as loaded by the next call
+            knowsys_collection.clear()
+            raise
+
+        if cache is not None:
+            knowsys_collection.save_snapshot(cache)
+        return knowsys_collection
+
+
+def __getattr__(name):
+    # `knowsys.root`, `knowsys.entity_root` and `knowsys.relation_root` load the knowledge system on first use
+    if name in ('root', 'entity_root', 'relation_root'):
+        return getattr(load_knowsys(), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
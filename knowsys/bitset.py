@@ -0,0 +1,171 @@
+import numpy as np
+
+from typing import *
+from knowsys.collection import _KnowsysCollection
+
+if TYPE_CHECKING:
+    from knowsys.collection import KnowsysCollection
+    from knowsys.types.base import KnowsysAllType
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words: np.ndarray) -> int:
+        return int(np.bitwise_count(words).sum())
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> int:
+        return int(_BYTE_COUNTS[words.view(np.uint8)].sum())
+
+
+def _nbytes(size: int) -> int:
+    # whole 64-bit words, the set operations run on uint64
+    return (size + 63) // 64 * 8
+
+
+class KnowsysBitset(object):
+    """
+    a set of items of a collection, one bit per item at its dense id (`KnowsysType.id`, its position in the
+    collection). the set operations, `len` and `in` run on the packed bits instead of the items.
+    bitsets built before the collection grew are padded with zeros.
+    """
+    __slots__ = ('collection', 'size', 'bits')
+
+    def __init__(self, collection: "KnowsysCollection", bits: Optional[np.ndarray] = None, size: Optional[int] = None):
+        self.collection = collection
+        self.size = len(collection) if size is None else size
+        self.bits: np.ndarray = np.zeros(_nbytes(self.size), dtype=np.uint8) if bits is None else bits
+
+    @classmethod
+    def from_mask(cls, collection: "KnowsysCollection", mask: np.ndarray) -> "KnowsysBitset":
+        bits = np.zeros(_nbytes(len(mask)), dtype=np.uint8)
+        packed = np.packbits(np.asarray(mask, dtype=bool), bitorder='little')
+        bits[:len(packed)] = packed
+        return cls(collection, bits, len(mask))
+
+    @classmethod
+    def from_ids(cls, collection: "KnowsysCollection", ids: Iterable[int]) -> "KnowsysBitset":
+        mask = np.zeros(len(collection), dtype=bool)
+        mask[np.asarray(list(ids) if not isinstance(ids, np.ndarray) else ids, dtype=np.int64)] = True
+        return cls.from_mask(collection, mask)
+
+    @classmethod
+    def from_items(cls, collection: "KnowsysCollection",
+                   items: Iterable[Union["KnowsysAllType", str]]) -> "KnowsysBitset":
+        """
+        :param items: knowsys items or codes, the unknown ones are ignored
+        """
+        ids = np.fromiter(map(collection.id_of, items), dtype=np.int64)
+        return cls.from_ids(collection, ids[ids >= 0])
+
+    @classmethod
+    def of_type(cls, collection: "KnowsysCollection",
+                knowsys_type_class: Union[type, Tuple[type, ...]]) -> "KnowsysBitset":
+        mask = np.zeros(len(collection), dtype=bool)
+        for t, indexes in collection._type_buckets.items():
+            if issubclass(t, knowsys_type_class):
+                mask[indexes] = True
+        return cls.from_mask(collection, mask)
+
+    @classmethod
+    def subtree(cls, collection: "KnowsysCollection", item: Union["KnowsysAllType", str],
+                include_self=True) -> "KnowsysBitset":
+        """
+        the descendants of `item` (an item or a code) in the hierarchy of the collection.
+        """
+        tin, tout, preorder = collection._hierarchy()
+        index = collection._code2index.get(getattr(item, 'code', item))
+        mask = np.zeros(len(collection), dtype=bool)
+        if index is not None and tin[index] >= 0:
+            mask[preorder[tin[index] + (0 if include_self else 1):tout[index]]] = True
+        return cls.from_mask(collection, mask)
+
+    def _words(self, size: int) -> np.ndarray:
+        if _nbytes(size) == len(self.bits):
+            return self.bits.view(np.uint64)
+        bits = np.zeros(_nbytes(size), dtype=np.uint8)
+        bits[:len(self.bits)] = self.bits
+        return bits.view(np.uint64)
+
+    def _combine(self, other: "KnowsysBitset", op: Callable) -> "KnowsysBitset":
+        if not isinstance(other, KnowsysBitset):
+            return NotImplemented
+        if other.collection is not self.collection:
+            raise ValueError('cannot combine the bitsets of different collections.')
+        size = max(self.size, other.size)
+        return KnowsysBitset(self.collection, op(self._words(size), other._words(size)).view(np.uint8), size)
+
+    def __and__(self, other):
+        return self._combine(other, np.bitwise_and)
+
+    def __or__(self, other):
+        return self._combine(other, np.bitwise_or)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b)
+
+    def __xor__(self, other):
+        return self._combine(other, np.bitwise_xor)
+
+    def __invert__(self):
+        bits = ~self.bits
+        # the bits past `size` stay cleared
+        bits[(self.size + 7) // 8:] = 0
+        if self.size % 8:
+            bits[self.size // 8] &= (1 << self.size % 8) - 1
+        return KnowsysBitset(self.collection, bits, self.size)
+
+    intersection = __and__
+    union = __or__
+    difference = __sub__
+    symmetric_difference = __xor__
+
+    def __eq__(self, other):
+        if not isinstance(other, KnowsysBitset):
+            return NotImplemented
+        size = max(self.size, other.size)
+        return other.collection is self.collection and np.array_equal(self._words(size), other._words(size))
+
+    __hash__ = None
+
+    def isdisjoint(self, other: "KnowsysBitset") -> bool:
+        return not (self & other).any()
+
+    def issubset(self, other: "KnowsysBitset") -> bool:
+        return not (self - other).any()
+
+    def any(self) -> bool:
+        return bool(self.bits.any())
+
+    def __len__(self):
+        return _popcount(self.bits.view(np.uint64))
+
+    count = __len__
+
+    def __contains__(self, item: Union["KnowsysAllType", str, int]):
+        index = int(item) if isinstance(item, (int, np.integer)) else self.collection.id_of(item)
+        if index < 0 or index >= self.size:
+            return False
+        return bool(self.bits[index >> 3] >> (index & 7) & 1)
+
+    def contains_many(self, items: Iterable[Union["KnowsysAllType", str]]) -> np.ndarray:
+        """
+        vectorized `in` over knowsys items or codes.
+        """
+        ids = np.fromiter(map(self.collection.id_of, items), dtype=np.int64)
+        valid = (ids >= 0) & (ids < self.size)
+        ids = np.where(valid, ids, 0)
+        return valid & (self.bits[ids >> 3] >> (ids & 7) & 1).astype(bool)
+
+    def ids(self) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.size, bitorder='little'))
+
+    def items(self) -> _KnowsysCollection:
+        data = self.collection.data
+        return _KnowsysCollection([data[i] for i in self.ids()])
+
+    def __iter__(self):
+        data = self.collection.data
+        return (data[i] for i in self.ids())
+
+    def __repr__(self):
+        return f'KnowsysBitset({len(self)}/{self.size})'
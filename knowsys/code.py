@@ -1,16 +1,107 @@
 import abc
 import enum
+import functools
 import logging
 
+import numpy as np
+
 from typing import *
 from knowsys.enums import Direction, CategoryType, GroupType
 
 
+# the decoded fields of a code, see `Code.decode_many`. category_type is 0 (unknown), 1 (entity) or 2 (relation),
+# the flags are 1 (True), 0 (False) or -1 (None), direction is the value of `Direction`
+CODE_DTYPE = np.dtype([
+    ('category_type', np.uint8),
+    ('is_property', np.int8),
+    ('is_group', np.int8),
+    ('is_term', np.int8),
+    ('category_id', np.uint8),
+    ('relation_id', np.uint8),
+    ('direction', np.uint8),
+    ('property_id', np.uint16),
+    ('extern_l1_id', np.uint8),
+    ('extern_l2_id', np.uint8),
+    ('checksum_ok', np.bool_),
+    ('valid', np.bool_),
+])
+
+CATEGORY_TYPES = (CategoryType.Unknown, CategoryType.Entity, CategoryType.Relation)
+
+# field -> (shift, width) of the decoded fields packed in one uint64 by `Code.pack_many`,
+# the flags are stored as 0 (None), 1 (False) or 2 (True)
+CODE_BITS = {
+    'category_type': (0, 2),
+    'is_property': (2, 2),
+    'is_group': (4, 2),
+    'is_term': (6, 2),
+    'category_id': (8, 7),
+    'valid': (15, 1),
+    'relation_id': (16, 8),
+    'direction': (24, 2),
+    'checksum_ok': (31, 1),
+    'property_id': (32, 12),
+    'extern_l1_id': (48, 8),
+    'extern_l2_id': (56, 8),
+}
+
+_FLAGS = ('is_property', 'is_group', 'is_term')
+
+
 class Code(abc.ABC):
 
+    __slots__ = ('is_property', 'is_group', 'is_term', 'category_type', 'category_id', 'relation_id', 'property_id',
+                 'extern_l1_id', 'extern_l2_id', 'direction', '_frozen')
+
     @classmethod
     def of(cls, code: str):
-        return V1Code(code)
+        # one shared, immutable object per code string
+        return _interned_v1_code(code)
+
+    @classmethod
+    def decode_many(cls, codes: Union[Iterable[str], np.ndarray]) -> np.ndarray:
+        return V1Code.decode_many(codes)
+
+    @classmethod
+    def encode_many(cls, decoded: np.ndarray) -> np.ndarray:
+        return V1Code.encode_many(decoded)
+
+    @staticmethod
+    def pack_many(decoded: np.ndarray) -> np.ndarray:
+        """
+        packs a structured array of `Code.decode_many` into uint64 integers, laid out by `CODE_BITS`.
+        """
+        res = np.zeros(len(decoded), dtype=np.uint64)
+        for name, (shift, width) in CODE_BITS.items():
+            value = decoded[name].astype(np.int64) + (1 if name in _FLAGS else 0)
+            res |= (value & ((1 << width) - 1)).astype(np.uint64) << np.uint64(shift)
+        return res
+
+    @staticmethod
+    def code_mask(**fields) -> Tuple[int, int]:
+        """
+        the (mask, value) of the packed codes matching every field, `packed & mask == value`.
+
+        :param fields: `category_type` (a `CategoryType`), `is_property` / `is_group` / `is_term` (True, False or None),
+                       `direction` (a `Direction`), `valid` / `checksum_ok` (bools) or the ids (ints)
+        """
+        mask, res = 0, 0
+        for name, value in fields.items():
+            if name not in CODE_BITS:
+                raise ValueError(f'unknown code field `{name}`, expected one of {list(CODE_BITS)}.')
+            shift, width = CODE_BITS[name]
+            if name == 'category_type':
+                value = CATEGORY_TYPES.index(value)
+            elif name in _FLAGS:
+                value = 0 if value is None else int(value) + 1
+            elif name == 'direction':
+                value = Direction(value).value
+            value = int(value)
+            if not 0 <= value < 1 << width:
+                raise ValueError(f'{name}={value} does not fit in {width} bits.')
+            mask |= ((1 << width) - 1) << shift
+            res |= value << shift
+        return mask, res
 
     _entity_type_map = {
         0: 'Unknown',
@@ -35,6 +126,11 @@ class Code(abc.ABC):
 
         self.direction: Direction = Direction.UNKNOWN
 
+    def __setattr__(self, key, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'`{self.__class__.__name__}` objects are immutable, they are shared by `Code.of`.')
+        super().__setattr__(key, value)
+
     @property
     def from_entity_id(self):
         if self.category_type == CategoryType.Relation:
@@ -66,6 +162,8 @@ class Code(abc.ABC):
 
 class V1Code(Code):
 
+    __slots__ = ('_string',)
+
     __version__ = 1
 
     @staticmethod
@@ -88,6 +186,103 @@ class V1Code(Code):
             return 0b10
         return 0b01
 
+    # character -> hex / decimal digit, -1 if it is not one
+    _HEX = np.full(128, -1, dtype=np.int16)
+    _HEX[np.frombuffer(b'0123456789abcdef', dtype=np.uint8)] = np.arange(16)
+    _HEX[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+    _DEC = np.where(_HEX < 10, _HEX, -1).astype(np.int16)
+    _DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+    # 16 ** (14 - i) % 13, the weight of the i-th hex digit in the checking code
+    _CHECK_WEIGHTS = np.array([pow(16, 14 - i, 13) for i in range(15)], dtype=np.int64)
+
+    @classmethod
+    def _chars(cls, codes) -> Tuple[np.ndarray, np.ndarray]:
+        arr = np.asarray(codes if isinstance(codes, np.ndarray) else list(codes))
+        if arr.dtype.kind not in 'SU':
+            arr = arr.astype(str)
+        lengths = np.char.str_len(arr).reshape(-1)
+        if arr.dtype.kind == 'S':
+            chars = np.ascontiguousarray(arr.astype('S16')).view(np.uint8).reshape(-1, 16)
+        else:
+            chars = np.ascontiguousarray(arr.astype('U16')).view(np.uint32).reshape(-1, 16)
+        return np.minimum(chars, 127).astype(np.intp), lengths == 16
+
+    @classmethod
+    def _nibbles(cls, decoded: np.ndarray) -> np.ndarray:
+        # the first 15 hex digits of the codes, as `_code_without_checking` writes them
+        nibbles = np.zeros((len(decoded), 15), dtype=np.int64)
+        flags = decoded['category_type'].astype(np.int64) << 6
+        for name, shift in (('is_property', 4), ('is_group', 2), ('is_term', 0)):
+            flag = decoded[name].astype(np.int64)
+            flags |= np.where(flag > 0, 0b10, np.where(flag == 0, 0b01, 0)) << shift
+        relation = decoded['category_type'] == 2
+        property_id = decoded['property_id'].astype(np.int64)
+        property_id = np.where(relation, (decoded['direction'].astype(np.int64) << 8) | (property_id & 0xff),
+                               property_id)
+        nibbles[:, 0] = 1
+        nibbles[:, 2], nibbles[:, 3] = flags >> 4, flags & 0xf
+        nibbles[:, 4], nibbles[:, 5] = np.divmod(decoded['category_id'].astype(np.int64), 10)
+        for pos, value, width in ((6, decoded['relation_id'], 2), (8, property_id, 3),
+                                  (11, decoded['extern_l1_id'], 2), (13, decoded['extern_l2_id'], 2)):
+            value = np.asarray(value, dtype=np.int64)
+            for i in range(width):
+                nibbles[:, pos + i] = (value >> (4 * (width - 1 - i))) & 0xf
+        return nibbles
+
+    @classmethod
+    def _checking_digits(cls, nibbles: np.ndarray) -> np.ndarray:
+        return cls._DIGITS[(nibbles * cls._CHECK_WEIGHTS).sum(axis=1) % 13]
+
+    @classmethod
+    def decode_many(cls, codes: Union[Iterable[str], np.ndarray]) -> np.ndarray:
+        """
+        decodes many codes at once into a structured array of `CODE_DTYPE`, without building `V1Code` objects.
+        `valid` is False for malformed codes, the other fields are then meaningless. `V1Code(code)` raises on them,
+        except that `int` lets a field like ` a` or `0x9` through. `checksum_ok` is False where `V1Code(code)`
+        would warn about the checking code.
+        """
+        chars, valid = cls._chars(codes)
+        hexes, decimals = cls._HEX[chars], cls._DEC[chars]
+        res = np.zeros(len(chars), dtype=CODE_DTYPE)
+
+        type_code = hexes[:, 2] * 16 + hexes[:, 3]
+        valid &= (hexes[:, 2:4] >= 0).all(axis=1) & (decimals[:, 4:6] >= 0).all(axis=1)
+        valid &= (hexes[:, 6:15] >= 0).all(axis=1)
+        for name, true_flag, false_flag in (('is_property', 0b00100000, 0b00010000),
+                                            ('is_group', 0b00001000, 0b00000100),
+                                            ('is_term', 0b00000010, 0b00000001)):
+            t, f = (type_code & true_flag) > 0, (type_code & false_flag) > 0
+            valid &= ~(t & f)
+            res[name] = np.where(t, 1, np.where(f, 0, -1))
+        relation, entity = (type_code & 0b10000000) > 0, (type_code & 0b01000000) > 0
+        valid &= ~(relation & entity)
+        res['category_type'] = np.where(relation, 2, np.where(entity, 1, 0))
+
+        res['category_id'] = decimals[:, 4] * 10 + decimals[:, 5]
+        res['relation_id'] = hexes[:, 6] * 16 + hexes[:, 7]
+        # the direction digit of a relation code is one of `0123`, `Direction` has the same values
+        valid &= ~relation | (decimals[:, 8] >= 0) & (decimals[:, 8] <= 3)
+        res['direction'] = np.where(relation, np.clip(hexes[:, 8], 0, 3), Direction.UNKNOWN.value)
+        res['property_id'] = np.where(relation, (hexes[:, 9] * 16 + hexes[:, 10]) & 0b00111111,
+                                      hexes[:, 8] * 256 + hexes[:, 9] * 16 + hexes[:, 10])
+        res['extern_l1_id'] = hexes[:, 11] * 16 + hexes[:, 12]
+        res['extern_l2_id'] = hexes[:, 13] * 16 + hexes[:, 14]
+
+        res['valid'] = valid
+        res['checksum_ok'] = valid & (cls._checking_digits(cls._nibbles(res)) == chars[:, 15])
+        return res
+
+    @classmethod
+    def encode_many(cls, decoded: np.ndarray) -> np.ndarray:
+        """
+        the codes of a structured array of `CODE_DTYPE`, as `V1Code.string` writes them.
+        """
+        nibbles = cls._nibbles(decoded)
+        chars = np.empty((len(decoded), 16), dtype=np.uint8)
+        chars[:, :15] = cls._DIGITS[nibbles]
+        chars[:, 15] = cls._checking_digits(nibbles)
+        return chars.view('S16').reshape(-1).astype('U16')
+
     def __init__(self, code: Union[str, List[bytes]]):
         super().__init__()
 
@@ -129,12 +324,19 @@ class V1Code(Code):
         self.extern_l1_id = int(code[11:13], 16)
         self.extern_l2_id = int(code[13:15], 16)
 
+        code_without_checking = self._encode()
+        self._string = code_without_checking + hex(int(code_without_checking, 16) % 13)[2:]
+        self._frozen = True
+
         if self.checking_code != code[-1]:
             logging.warning(f'code: {code} checking fail.')
 
+    def __reduce__(self):
+        return Code.of, (self._string,)
+
     @property
     def checking_code(self):
-        return hex(int(self._code_without_checking, 16) % 13)[2:]
+        return self._string[-1]
 
     @staticmethod
     def hex_padding(value, length=2) -> str:
@@ -149,10 +351,13 @@ class V1Code(Code):
 
     @property
     def string(self):
-        return self._code_without_checking + self.checking_code
+        return self._string
 
     @property
     def _code_without_checking(self):
+        return self._string[:-1]
+
+    def _encode(self) -> str:
         magic_str = '10'
 
         flag = {
@@ -184,3 +389,7 @@ class V1Code(Code):
 
         return magic_str + flag_str + type_str + relation_str + property_str + extern_l1_str + extern_l2_str
 
+
+@functools.lru_cache(maxsize=1 << 16)
+def _interned_v1_code(code: str) -> V1Code:
+    return V1Code(code)
@@ -1,4 +1,11 @@
+import bisect
+import csv
+import functools
+import heapq
+import inspect
+import itertools
 import logging
+import math
 import os
 import typing
 
@@ -7,7 +14,11 @@ from collections import defaultdict, Counter
 from typing import *
 
 if typing.TYPE_CHECKING:
+    import pandas as pd
     from knowsys.types.base import KnowsysAllType
+    from knowsys.snapshot import KnowsysSnapshot
+    from knowsys.search import NameIndex
+    from knowsys.bitset import KnowsysBitset
 
 
 class _KnowsysCollection(object):
@@ -21,32 +32,53 @@ class _KnowsysCollection(object):
         if data is not None:
             self._data = data
 
-        self._code2item: Dict[str, "KnowsysAllType"] = {}
+        # the lookup indexes are built on first use, most query results are only iterated
+        for name in ('_code2item', '_name2item', '_type_buckets'):
+            self.__dict__.pop(name, None)
+
         if code2item is not None:
             assert len(code2item) == len(self._data), \
                 f'len(code2item):{len(code2item)} is not equal to len(data): {len(self._data)}'
             self._code2item = code2item
-        else:
-            for item in self._data:
-                self._code2item[item.code] = item
 
-        self._name2item: Dict[str, List["KnowsysAllType"]] = defaultdict(list)
         if name2item is not None:
             assert sum([len(v) for v in name2item.values()]) == len(self._data), \
                 (f'len(name2item):{sum([len(v) for v in name2item.values()])} '
                  f'is not equal to len(data): {len(self._data)}')
             self._name2item = name2item
-        else:
-            for item in self._data:
-                self._name2item[item.name].append(item)
+
+        self._type_views: Dict[type, "_KnowsysCollection"] = {}
+
+    @functools.cached_property
+    def _code2item(self) -> Dict[str, "KnowsysAllType"]:
+        return {item.code: item for item in self._data}
+
+    @functools.cached_property
+    def _name2item(self) -> Dict[str, List["KnowsysAllType"]]:
+        name2item = defaultdict(list)
+        for item in self._data:
+            name2item[item.name].append(item)
+        return name2item
+
+    @functools.cached_property
+    def _type_buckets(self) -> Dict[type, List[int]]:
+        # positions in `_data` grouped by the concrete class of the items
+        type_buckets = defaultdict(list)
+        for index, item in enumerate(self._data):
+            type_buckets[item.__class__].append(index)
+        return type_buckets
 
     def contain_with_parent(self, item):
+        """
+        whether the collection contains `item` or one of its ancestors.
+        """
         from knowsys.types.base import KnowsysAllType
         if not isinstance(item, KnowsysAllType):
             raise TypeError(f'item is not a KnowsysAllType: {item}')
-        for item in self._data:
-            if isinstance(item, KnowsysAllType) and item.is_belong_to(item):
+        while item is not None and not isinstance(item, _LazyLoadType):
+            if item.code in self._code2item:
                 return True
+            item = item.parent
         return False
 
     def __contains__(self, item):
@@ -64,9 +96,13 @@ class _KnowsysCollection(object):
         return self._data
 
     def _add(self, knowsys_item: "KnowsysAllType"):
+        # the indexes not built yet are built before the item is appended
+        code2item, name2item = self._code2item, self._name2item
+        self._type_buckets[knowsys_item.__class__].append(len(self._data))
+        self._type_views.clear()
         self._data.append(knowsys_item)
-        self._code2item[knowsys_item.code] = knowsys_item
-        self._name2item[knowsys_item.name].append(knowsys_item)
+        code2item[knowsys_item.code] = knowsys_item
+        name2item[knowsys_item.name].append(knowsys_item)
 
     def find(self, code: str, default=None):
         return self._code2item.get(code, default)
@@ -84,32 +120,48 @@ class _KnowsysCollection(object):
                 return default
 
     def filter(self, func: Callable) -> "_KnowsysCollection":
-        data = list(filter(func, self._data))
-        return _KnowsysCollection(data,
-                                  {item.code: self._code2item[item.code] for item in data},
-                                  None)
+        return _KnowsysCollection(list(filter(func, self._data)))
 
     def map(self, func: Callable):
         from knowsys.types.base import KnowsysType
         data = list(map(func, self._data))
-        if all([isinstance(item, KnowsysType) for item in data]):
+        if all(isinstance(item, KnowsysType) for item in data):
             data = _KnowsysCollection(data)
         return data
 
+    def bitset(self) -> "KnowsysBitset":
+        """
+        the items as a bitset over the dense ids of the knowledge system.
+        """
+        from knowsys.bitset import KnowsysBitset
+        return KnowsysBitset.from_items(KnowsysCollection.instance, self._data)
+
+    def query(self) -> "_KnowsysQuery":
+        """
+        a lazy query over the collection, see `_KnowsysQuery`.
+        """
+        return _KnowsysQuery(self)
+
     def extend(self, items):
         for item in items:
             self._add(item)
 
     def flatten(self):
         from knowsys.types.base import KnowsysType
-        res = _KnowsysCollection()
-        for item in self._data:
-            if isinstance(item, KnowsysType):
-                res.extend(item.flatten())
-        return res
+        return _KnowsysCollection([descendant for item in self._data if isinstance(item, KnowsysType)
+                                   for descendant in item.flatten()])
 
-    def _filter_by_type(self, knowsys_type_class: type):
-        return self.filter(lambda x: isinstance(x, knowsys_type_class))
+    def _filter_by_exact_type(self, knowsys_type_class: type) -> "_KnowsysCollection":
+        return _KnowsysCollection([self._data[i] for i in self._type_buckets.get(knowsys_type_class, [])])
+
+    def _filter_by_type(self, knowsys_type_class: type) -> "_KnowsysCollection":
+        view = self._type_views.get(knowsys_type_class)
+        if view is None:
+            buckets = [indexes for t, indexes in self._type_buckets.items() if issubclass(t, knowsys_type_class)]
+            # merging the sorted buckets keeps the order of the collection
+            view = _ReadOnlyKnowsysCollection([self._data[i] for i in heapq.merge(*buckets)])
+            self._type_views[knowsys_type_class] = view
+        return view
 
     @property
     def entity_types(self):
@@ -136,7 +188,25 @@ class _KnowsysCollection(object):
         from knowsys.types.term_type import RelationTermType
         return self._filter_by_type(RelationTermType)
 
-    # TODO: add types
+    @property
+    def property_types(self):
+        from knowsys.types.property_type import PropertyType
+        return self._filter_by_type(PropertyType)
+
+    @property
+    def entity_property_types(self):
+        from knowsys.types.property_type import EntityPropertyType
+        return self._filter_by_type(EntityPropertyType)
+
+    @property
+    def relation_property_types(self):
+        from knowsys.types.property_type import RelationPropertyType
+        return self._filter_by_type(RelationPropertyType)
+
+    @property
+    def property_term_types(self):
+        from knowsys.types.term_type import PropertyTermType
+        return self._filter_by_type(PropertyTermType)
 
     def list(self):
         return list(self)
@@ -157,12 +227,167 @@ class _KnowsysCollection(object):
         return f'_KnowsysCollection(total:{len(self._data)}|{self.count_summary()})'
 
 
+class _ReadOnlyKnowsysCollection(_KnowsysCollection):
+    """
+    a collection shared by caches, adding items to it raises a TypeError.
+    """
+
+    def _add(self, knowsys_item: "KnowsysAllType"):
+        raise TypeError(f'cannot add `{knowsys_item}` to a read-only collection.')
+
+
+class _KnowsysQuery(object):
+    """
+    a lazy query over a collection. `filter`, `map`, `type`, `subtree` and `limit` return a new query with one
+    more step, nothing runs until the query is iterated: the steps are then chained iterators over the source,
+    a single pass without intermediate list, stopped as soon as `limit` is reached.
+    the other attributes of `_KnowsysCollection` (`len`, indexing, `find`, `find_name`, ...) materialize the result
+    once, its code and name dicts are only built if a lookup is made.
+    """
+
+    def __init__(self, source: Iterable, steps: Tuple[Tuple[str, Any], ...] = ()):
+        self._source = source
+        self._steps = steps
+        self._result = None
+
+    def _then(self, step: str, arg) -> "_KnowsysQuery":
+        return _KnowsysQuery(self._source, self._steps + ((step, arg),))
+
+    def filter(self, func: Callable) -> "_KnowsysQuery":
+        return self._then('filter', func)
+
+    def map(self, func: Callable) -> "_KnowsysQuery":
+        return self._then('map', func)
+
+    def type(self, knowsys_type_class: Union[type, Tuple[type, ...]]) -> "_KnowsysQuery":
+        if not self._steps and isinstance(self._source, _KnowsysCollection) and isinstance(knowsys_type_class, type):
+            # the first step, the source has a cached view by type
+            return _KnowsysQuery(self._source._filter_by_type(knowsys_type_class))
+        return self._then('filter', lambda item: isinstance(item, knowsys_type_class))
+
+    def subtree(self, item: "KnowsysAllType", include_self=True) -> "_KnowsysQuery":
+        """
+        the items under `item` in the hierarchy of its collection.
+        """
+        collection = item.collection
+        if include_self:
+            return self._then('filter', lambda x: x is item or collection.is_belong_to(x, item))
+        return self._then('filter', lambda x: collection.is_belong_to(x, item))
+
+    def limit(self, n: int) -> "_KnowsysQuery":
+        return self._then('limit', n)
+
+    def __iter__(self):
+        if self._result is not None:
+            return iter(self._result)
+        res = iter(self._source)
+        for step, arg in self._steps:
+            if step == 'filter':
+                res = filter(arg, res)
+            elif step == 'map':
+                res = map(arg, res)
+            else:
+                res = itertools.islice(res, arg)
+        return res
+
+    def collect(self) -> Union[_KnowsysCollection, List]:
+        """
+        the result as a `_KnowsysCollection`, or a list if a `map` made something else than knowsys items.
+        """
+        if self._result is None:
+            from knowsys.types.base import KnowsysType
+            data = list(iter(self))
+            if all(isinstance(item, KnowsysType) for item in data):
+                data = _KnowsysCollection(data)
+            self._result = data
+        return self._result
+
+    def list(self):
+        # not `list(self)`, its length hint would materialize the result
+        return list(iter(self))
+
+    def __len__(self):
+        return len(self.collect())
+
+    def __getitem__(self, item):
+        return self.collect()[item]
+
+    def __contains__(self, item):
+        return item in self.collect()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.collect(), name)
+
+    def __repr__(self):
+        return f'_KnowsysQuery({" -> ".join(step for step, _ in self._steps) or "all"})'
+
+
+def memoized(func):
+    """
+    caches the result of a query method of a knowsys item in its collection, until the collection changes.
+    `refresh=False` returns the cached result even if it is stale (None if never computed).
+    """
+    @functools.wraps(func)
+    def wrapper(self, refresh=True):
+        return self.collection.memoize(func.__name__, self, lambda: func(self), refresh)
+    return wrapper
+
+
+# attributes of knowsys items holding other items, `contain_entities` is a tuple of items
+_REFERENCES = ('parent', 'belong_to', 'contain_entities')
+
+
+def _insort_unique(indexes: List[int], index: int):
+    pos = bisect.bisect_left(indexes, index)
+    if pos == len(indexes) or indexes[pos] != index:
+        indexes.insert(pos, index)
+
+
+def _remove_sorted(indexes: List[int], index: int):
+    pos = bisect.bisect_left(indexes, index)
+    if pos < len(indexes) and indexes[pos] == index:
+        del indexes[pos]
+
+
+# the `id` of the items built by an unbound `KnowsysSnapshot`, they are in no collection
+UNBOUND_ID = -1
+
+
+def _check_bound(knowsys_item: "KnowsysAllType"):
+    if getattr(knowsys_item, 'id', None) == UNBOUND_ID:
+        raise ValueError(f'`{knowsys_item.code}` was built by a snapshot not bound to a collection, '
+                         f'query the snapshot or bind it first (`KnowsysSnapshot.bind`).')
+
+
+def _assign(knowsys_item: "KnowsysAllType", attr: str, value):
+    # sets a reference without going through its property, the caller updates the indexes
+    setattr(knowsys_item, '_' + attr, value)
+
+
+def _knowsys_classes() -> List[type]:
+    from knowsys.types.base import KnowsysType
+    from knowsys.types.entity_type import EntityType
+    from knowsys.types.relation_type import RelationType
+    from knowsys.types.property_type import PropertyType, EntityPropertyType, RelationPropertyType
+    from knowsys.types.term_type import TermType, EntityTermType, RelationTermType, PropertyTermType
+    return [KnowsysType, EntityType, RelationType, PropertyType, EntityPropertyType, RelationPropertyType,
+            TermType, EntityTermType, RelationTermType, PropertyTermType]
+
+
 class _LazyLoadType(object):
 
     def __init__(self, code, name):
         self.code = code
         self.name = name
 
+    @property
+    def key(self) -> Tuple[str, Any]:
+        if self.code is not None:
+            return 'code', self.code
+        return 'name', self.name
+
     def real(self):
         if self.code is not None:
             return KnowsysCollection.instance.get(self.code)
@@ -176,37 +401,438 @@ class KnowsysCollection(_KnowsysCollection):
 
     def save(self, dir_path):
         os.makedirs(dir_path, exist_ok=True)
-        types = set([item.__class__ for item in self._data])
-        for t in types:
-            data = self._filter_by_type(t)
-            with open(os.path.join(dir_path, f'{t.__name__}.csv'), 'w', encoding='utf8') as f:
-                f.write(','.join(t.saving_meta()) + '\n')
+        for t in list(self._type_buckets):
+            data = self._filter_by_exact_type(t)
+            with open(os.path.join(dir_path, f'{t.__name__}.csv'), 'w', encoding='utf8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(t.saving_meta())
                 for item in data:
-                    f.write(','.join([str(item) for item in item.saving_list()]) + '\n')
+                    writer.writerow([str(item) for item in item.saving_list()])
 
     @classmethod
     def load(cls, dir_path):
-        from knowsys.types import (EntityType, EntityTermType, RelationTermType,
-                                   RelationType, EntityPropertyType, RelationPropertyType)
-        class_mapping = {t.__name__: t for t in [EntityType, EntityTermType, RelationTermType,
-                                                 RelationType, EntityPropertyType, RelationPropertyType]}
+        class_mapping = {t.__name__: t for t in _knowsys_classes()}
         for filename in os.listdir(dir_path):
             if filename.endswith('.csv'):
                 class_name = filename.split('.')[0]
                 t_class = class_mapping[class_name]
-                with open(os.path.join(dir_path, filename), 'r', encoding='utf8') as f:
-                    f.readline()
-                    for line in f:
-                        line = line.strip()
-                        t_class.load_list(line.split(','))
+                with open(os.path.join(dir_path, filename), 'r', encoding='utf8', newline='') as f:
+                    reader = csv.reader(f)
+                    next(reader)
+                    for row in reader:
+                        t_class.load_list(row)
+
+    def save_snapshot(self, path):
+        self.freeze().save(path)
+
+    @classmethod
+    def load_snapshot(cls, path) -> "KnowsysSnapshot":
+        from knowsys.snapshot import KnowsysSnapshot
+        return KnowsysSnapshot.load(path)
 
     def __init__(self):
         if self.instance is not None:
             raise EnvironmentError('the collection only can be init ones.')
 
         super().__init__()
+        self._version: int = 0
+        self._init_indexes()
         self.__class__.instance = self
 
+    def _init_indexes(self):
+        self._children: Dict[str, List[int]] = defaultdict(list)
+        # concrete class -> belong_to code -> positions of the items belonging to it
+        self._belongings: Dict[type, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(list))
+        # (entity code, 'from' / 'to') -> positions of the relations starting / ending by it
+        self._endpoints: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+
+        # ('code' / 'name', target) -> (item position, attribute, position in a tuple attribute) of the lazy
+        # references waiting for the target to be added
+        self._waiting: Dict[Tuple[str, Any], List[Tuple[int, str, Optional[int]]]] = defaultdict(list)
+
+        self._code2index: Dict[str, int] = {}
+        # decoded codes of the items packed by `Code.pack_many`, extended on the next `where_code`
+        self._packed_codes: np.ndarray = np.zeros(0, dtype=np.uint64)
+        self._name_index: Optional["NameIndex"] = None
+        # pre-order numbering of the hierarchy, the subtree of item `i` is `_preorder[_tin[i]:_tout[i]]`.
+        # rebuilt on demand after the hierarchy changed.
+        self._tin: Optional[np.ndarray] = None
+        self._tout: Optional[np.ndarray] = None
+        self._preorder: Optional[np.ndarray] = None
+
+        # `_version` is bumped on every change of the graph, memoized results of older versions are stale
+        self._memo: Dict[Tuple[str, str], Tuple[int, Any]] = {}
+        self.memo_hits: int = 0
+        self.memo_misses: int = 0
+
+    def clear(self):
+        """
+        removes every item, so that the knowledge system can be loaded again.
+        """
+        _KnowsysCollection.__init__(self)
+        self._init_indexes()
+        self._version += 1
+
+    def _add(self, knowsys_item: "KnowsysAllType"):
+        self._version += 1
+        index = len(self._data)
+        self._code2index[knowsys_item.code] = index
+        knowsys_item.id = index
+        super()._add(knowsys_item)
+        self._wait_lazy(index, knowsys_item)
+        self._link_parent(index, knowsys_item)
+        self._link_belong_to(index, knowsys_item)
+        self._link_endpoints(index, knowsys_item)
+        self._resolve_waiting(knowsys_item)
+
+    def _link(self, index: int, knowsys_item: "KnowsysAllType", attr: str):
+        if attr == 'parent':
+            self._link_parent(index, knowsys_item)
+        elif attr == 'belong_to':
+            self._link_belong_to(index, knowsys_item)
+        elif attr in ('contain_entities', 'direction'):
+            self._link_endpoints(index, knowsys_item)
+
+    def _unlink(self, index: int, knowsys_item: "KnowsysAllType", attr: str, old):
+        """
+        removes the item from the indexes it was put in by `old`, the previous value of `attr`.
+        """
+        if attr in _REFERENCES:
+            for v in (old if isinstance(old, tuple) else (old,)):
+                if isinstance(v, _LazyLoadType) and v.key in self._waiting:
+                    waiting = self._waiting[v.key]
+                    waiting[:] = [w for w in waiting if w[:2] != (index, attr)]
+                    if not waiting:
+                        del self._waiting[v.key]
+        if attr == 'parent':
+            self._preorder = None
+            if old is not None and not isinstance(old, _LazyLoadType):
+                _remove_sorted(self._children.get(old.code, []), index)
+        elif attr == 'belong_to':
+            if old is not None and not isinstance(old, _LazyLoadType):
+                _remove_sorted(self._belongings.get(knowsys_item.__class__, {}).get(old.code, []), index)
+        elif attr in ('contain_entities', 'direction'):
+            # the roles of the endpoints depend on the direction, the old entities are removed from both
+            entities = old if attr == 'contain_entities' else getattr(knowsys_item, 'contain_entities', None)
+            for entity in entities or ():
+                if entity is None or isinstance(entity, _LazyLoadType):
+                    continue
+                for role in ('from', 'to'):
+                    _remove_sorted(self._endpoints.get((entity.code, role), []), index)
+
+    def relink(self, knowsys_item: "KnowsysAllType", attr: str, old):
+        """
+        updates the indexes after `attr` of an item of the collection changed from `old`. called by the
+        reference properties of the knowsys types, e.g. `item.parent = other`.
+        """
+        index = self._code2index.get(getattr(knowsys_item, 'code', None))
+        if index is None or self._data[index] is not knowsys_item:
+            # not registered yet, `_add` links it
+            return
+        self._unlink(index, knowsys_item, attr, old)
+        self._version += 1
+        if attr in _REFERENCES:
+            self._wait_lazy(index, knowsys_item, (attr,))
+        self._link(index, knowsys_item, attr)
+
+    def _wait_lazy(self, index: int, knowsys_item: "KnowsysAllType", attrs: Sequence[str] = _REFERENCES):
+        """
+        resolves the lazy references of a newly added item, the missing ones are put in the worklist.
+        """
+        for k in attrs:
+            v = getattr(knowsys_item, k, None)
+            if isinstance(v, _LazyLoadType):
+                real_v = v.real()
+                if real_v is None:
+                    self._waiting[v.key].append((index, k, None))
+                else:
+                    _assign(knowsys_item, k, real_v)
+            elif isinstance(v, tuple) and any(isinstance(i, _LazyLoadType) for i in v):
+                values = list(v)
+                for pos, i in enumerate(v):
+                    if isinstance(i, _LazyLoadType):
+                        real_i = i.real()
+                        if real_i is None:
+                            self._waiting[i.key].append((index, k, pos))
+                        else:
+                            values[pos] = real_i
+                _assign(knowsys_item, k, tuple(values))
+
+    def _set_reference(self, index: int, attr: str, pos: Optional[int], value):
+        item = self._data[index]
+        if pos is None:
+            _assign(item, attr, value)
+        else:
+            values = list(getattr(item, attr))
+            values[pos] = value
+            _assign(item, attr, tuple(values))
+        self._version += 1
+        self._link(index, item, attr)
+
+    def _resolve_waiting(self, knowsys_item: "KnowsysAllType"):
+        """
+        gives a newly added item to the lazy references waiting for its code or name.
+        """
+        for key in (('code', knowsys_item.code), ('name', knowsys_item.name)):
+            for index, attr, pos in self._waiting.pop(key, []):
+                self._set_reference(index, attr, pos, knowsys_item)
+
+    def _link_parent(self, index: int, knowsys_item: "KnowsysAllType"):
+        self._preorder = None
+        parent = getattr(knowsys_item, 'parent', None)
+        if parent is None or isinstance(parent, _LazyLoadType):
+            return
+        # children are kept in insertion order of the collection, whatever order the parents resolved in
+        _insort_unique(self._children[parent.code], index)
+
+    def _link_belong_to(self, index: int, knowsys_item: "KnowsysAllType"):
+        belong_to = getattr(knowsys_item, 'belong_to', None)
+        if belong_to is None or isinstance(belong_to, _LazyLoadType):
+            return
+        _insort_unique(self._belongings[knowsys_item.__class__][belong_to.code], index)
+
+    def belongings_of(self, item: "KnowsysAllType", knowsys_type_class: type,
+                      roots_only: bool = False) -> _KnowsysCollection:
+        buckets = [by_code.get(item.code, []) for t, by_code in self._belongings.items()
+                   if issubclass(t, knowsys_type_class)]
+        data = [self._data[i] for i in heapq.merge(*buckets)]
+        if roots_only:
+            data = [i for i in data if i.parent is None]
+        return _KnowsysCollection(data)
+
+    def _link_endpoints(self, index: int, knowsys_item: "KnowsysAllType"):
+        from knowsys.types.relation_type import RelationType
+        if not isinstance(knowsys_item, RelationType):
+            return
+        for role, entity in [('from', knowsys_item.from_entity), ('to', knowsys_item.to_entity)]:
+            if entity is None or isinstance(entity, _LazyLoadType):
+                continue
+            _insort_unique(self._endpoints[(entity.code, role)], index)
+
+    def relations_of(self, entity: "KnowsysAllType", role: str, with_parents: bool = False) -> _KnowsysCollection:
+        if role not in ('from', 'to'):
+            raise ValueError(f'role should be `from` or `to`, got `{role}`.')
+        buckets = []
+        while entity is not None and not isinstance(entity, _LazyLoadType):
+            buckets.append(self._endpoints.get((entity.code, role), []))
+            if not with_parents:
+                break
+            entity = entity.parent
+        return _KnowsysCollection([self._data[i] for i in heapq.merge(*buckets)])
+
+    def children_of(self, item: "KnowsysAllType") -> _KnowsysCollection:
+        return _KnowsysCollection([self._data[i] for i in self._children.get(item.code, [])])
+
+    def walk(self, item: "KnowsysAllType") -> Iterator["KnowsysAllType"]:
+        # each item is yielded once, a parent cycle would loop forever otherwise
+        seen = {id(item)}
+        stack = [item]
+        while stack:
+            node = stack.pop()
+            yield node
+            children = [self._data[i] for i in reversed(self._children.get(node.code, []))]
+            children = [c for c in children if id(c) not in seen]
+            seen.update(map(id, children))
+            stack.extend(children)
+
+    def _build_hierarchy(self):
+        roots = []
+        for index, item in enumerate(self._data):
+            parent = item.parent
+            if parent is None or isinstance(parent, _LazyLoadType) or parent.code not in self._code2index:
+                roots.append(index)
+
+        order = []
+        stack = roots[::-1]
+        while stack:
+            index = stack.pop()
+            order.append(index)
+            stack.extend(reversed(self._children.get(self._data[index].code, [])))
+
+        if len(order) < len(self._data):
+            # items not reached from a root are in a parent cycle or under one, they are not numbered (tin -1)
+            # and the queries about them walk the parents and the children instead
+            cycles = self._parent_cycles()
+            logging.warning(f'Parent cycle. {len(cycles)} items are their own ancestor: '
+                            f'{", ".join(self._data[i].code for i in cycles[:10])}{" ..." if len(cycles) > 10 else ""}')
+
+        tin = np.full(len(self._data), -1, dtype=np.int64)
+        tin[order] = np.arange(len(order))
+        size = np.ones(len(self._data), dtype=np.int64)
+        for index in reversed(order):
+            parent = self._data[index].parent
+            if parent is not None and not isinstance(parent, _LazyLoadType):
+                parent_index = self._code2index.get(parent.code)
+                if parent_index is not None:
+                    size[parent_index] += size[index]
+
+        self._tin = tin
+        self._tout = tin + size
+        self._preorder = np.asarray(order, dtype=np.int64)
+
+    def _parent_cycles(self) -> List[int]:
+        """
+        the positions of the items that are their own ancestor.
+        """
+        # 0: not visited, 1: on the current parent chain, 2: done
+        state = [0] * len(self._data)
+        res = []
+        for start in range(len(self._data)):
+            chain = []
+            index = start
+            while index is not None and state[index] == 0:
+                state[index] = 1
+                chain.append(index)
+                parent = self._data[index].parent
+                index = None if parent is None or isinstance(parent, _LazyLoadType) else self._indexed(parent)
+            if index is not None and state[index] == 1:
+                res.extend(chain[chain.index(index):])
+            for i in chain:
+                state[i] = 2
+        return sorted(res)
+
+    def _hierarchy(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._preorder is None:
+            self._build_hierarchy()
+        return self._tin, self._tout, self._preorder
+
+    def _indexed(self, item: "KnowsysAllType") -> Optional[int]:
+        index = self._code2index.get(item.code)
+        if index is None or self._data[index] is not item:
+            return None
+        return index
+
+    def is_belong_to(self, item: "KnowsysAllType", ancestor: "KnowsysAllType") -> bool:
+        _check_bound(ancestor)
+        tin, tout, _ = self._hierarchy()
+        index = self._indexed(item)
+        ancestor_index = self._code2index.get(getattr(ancestor, 'code', None))
+        if index is None or ancestor_index is None or tin[index] < 0:
+            _check_bound(item)
+            # not numbered (item outside the collection or in a parent cycle), walk up the parents
+            seen = {id(item)}
+            tmp = item.parent
+            while tmp is not None and not isinstance(tmp, _LazyLoadType) and id(tmp) not in seen:
+                if tmp == ancestor:
+                    return True
+                seen.add(id(tmp))
+                tmp = tmp.parent
+            return False
+        return bool(tin[ancestor_index] < tin[index] < tout[ancestor_index])
+
+    def is_belong_to_many(self, codes: Sequence[str], ancestor_codes: Union[str, Sequence[str]]) -> np.ndarray:
+        """
+        vectorized `is_belong_to` over codes, `ancestor_codes` is a single code or one code per item.
+        unknown codes are never belong to anything.
+        """
+        indexes = self.indexes_of(codes)
+        if isinstance(ancestor_codes, str):
+            ancestor_codes = [ancestor_codes]
+        ancestor_indexes = self.indexes_of(ancestor_codes)
+
+        valid = (indexes >= 0) & (ancestor_indexes >= 0)
+        if len(self._data) == 0:
+            return np.zeros(valid.shape, dtype=bool)
+        tin, tout, _ = self._hierarchy()
+        # unknown codes are looked up at 0 then masked out
+        indexes, ancestor_indexes = np.where(valid, indexes, 0), np.where(valid, ancestor_indexes, 0)
+        item_tin = tin[indexes]
+        res = (tin[ancestor_indexes] < item_tin) & (item_tin < tout[ancestor_indexes]) & (item_tin >= 0)
+        return res & valid
+
+    def bitset(self) -> "KnowsysBitset":
+        from knowsys.bitset import KnowsysBitset
+        return KnowsysBitset.from_mask(self, np.ones(len(self._data), dtype=bool))
+
+    def id_of(self, item: Union["KnowsysAllType", str]) -> int:
+        """
+        the dense id of an item or a code, -1 if it is not in the collection.
+        """
+        index = getattr(item, 'id', None)
+        if index is not None and index < len(self._data) and self._data[index] is item:
+            return index
+        return self._code2index.get(getattr(item, 'code', item), -1)
+
+    def indexes_of(self, codes: Sequence[str]) -> np.ndarray:
+        """
+        the dense ids of the items, their positions in the collection, -1 for unknown codes.
+        """
+        return np.fromiter((self._code2index.get(code, -1) for code in codes), dtype=np.int64, count=len(codes))
+
+    def descendants_of(self, item: "KnowsysAllType", include_self=False) -> _KnowsysCollection:
+        tin, tout, preorder = self._hierarchy()
+        index = self._indexed(item)
+        if index is None or tin[index] < 0:
+            _check_bound(item)
+            res = list(self.walk(item))
+            return _KnowsysCollection(res if include_self else res[1:])
+        start = tin[index] if include_self else tin[index] + 1
+        return _KnowsysCollection([self._data[i] for i in preorder[start:tout[index]]])
+
+    def _code_bits(self) -> np.ndarray:
+        from knowsys.code import Code
+
+        done = len(self._packed_codes)
+        if done < len(self._data):
+            added = Code.pack_many(Code.decode_many([item.code for item in self._data[done:]]))
+            self._packed_codes = np.concatenate([self._packed_codes, added])
+        return self._packed_codes
+
+    def where_code(self, **fields) -> _KnowsysCollection:
+        """
+        the items whose code decodes to the given fields, answered by one mask comparison over the packed codes,
+        e.g. `where_code(is_term=True, category_id=15, direction=Direction.FORWARD)`. malformed codes only match
+        `valid=False`.
+
+        :param fields: see `Code.code_mask`
+        """
+        from knowsys.code import Code
+
+        fields.setdefault('valid', True)
+        mask, value = Code.code_mask(**fields)
+        positions = np.flatnonzero((self._code_bits() & np.uint64(mask)) == np.uint64(value))
+        return _ReadOnlyKnowsysCollection([self._data[i] for i in positions])
+
+    def name_index(self) -> "NameIndex":
+        """
+        the prefix and fuzzy search index over the names of the items, built again once the collection changes.
+        """
+        from knowsys.search import NameIndex
+
+        if self._name_index is None or self._name_index.version != self._version:
+            self._name_index = NameIndex(self)
+        return self._name_index
+
+    def memoize(self, name: str, item: "KnowsysAllType", func: Callable, refresh=True):
+        if self._indexed(item) is None:
+            _check_bound(item)
+            # only items registered in the collection are cached, the code of others may be shadowed
+            return _ReadOnlyKnowsysCollection(func().data) if refresh else None
+        key = (name, item.code)
+        cached = self._memo.get(key)
+        if cached is not None and (not refresh or cached[0] == self._version):
+            self.memo_hits += 1
+            return cached[1]
+        if not refresh:
+            return None
+        self.memo_misses += 1
+        res = _ReadOnlyKnowsysCollection(func().data)
+        self._memo[key] = (self._version, res)
+        return res
+
+    def memo_stats(self) -> Dict[str, int]:
+        return {'hits': self.memo_hits, 'misses': self.memo_misses,
+                'size': len(self._memo), 'version': self._version}
+
+    def clear_memo(self):
+        self._memo.clear()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    def freeze(self) -> "KnowsysSnapshot":
+        from knowsys.snapshot import KnowsysSnapshot
+        return KnowsysSnapshot.from_collection(self)
+
     def add(self, knowsys_item: "KnowsysAllType", skip=False):
         if knowsys_item.code in self._code2item:
             if skip:
@@ -214,6 +840,121 @@ class KnowsysCollection(_KnowsysCollection):
             raise ValueError(f'`{knowsys_item}` has been created in KnowsysCollection.')
         self._add(knowsys_item)
 
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _init_defaults(knowsys_type_class: type) -> Dict[str, Any]:
+        params = list(inspect.signature(knowsys_type_class.__init__).parameters.values())[1:]
+        return {p.name: (None if p.default is inspect.Parameter.empty else p.default) for p in params}
+
+    def _reference(self, value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return None
+        if isinstance(value, str):
+            res = self._code2item.get(value)
+            return _LazyLoadType(value, None) if res is None else res
+        return value
+
+    def bulk_add(self, knowsys_type_class: Union[type, Sequence[type]],
+                 columns: Mapping[str, Sequence]) -> List["KnowsysAllType"]:
+        """
+        creates and registers knowsys items from columns, one item per row, without going through
+        the constructors one by one.
+
+        :param knowsys_type_class: the class of the items, or one class per row
+        :param columns: `code`, `name` and the other arguments of the class constructor. `parent`, `belong_to`
+                        and the items of `contain_entities` are knowsys items, lazy references or codes.
+                        they are resolved once the whole batch is added, the missing ones wait in the worklist.
+        :return: the items added
+        """
+        from knowsys.types.base import intern_str
+
+        columns = {k: v.to_numpy() if hasattr(v, 'to_numpy') else v for k, v in columns.items()}
+        codes = np.asarray(columns['code'], dtype=object)
+        length = len(codes)
+        if isinstance(knowsys_type_class, type):
+            classes = [knowsys_type_class] * length
+        else:
+            classes = list(knowsys_type_class)
+
+        # codes redefined in the batch or in the collection keep their first definition
+        str_codes = codes.astype(str)
+        keep = np.zeros(length, dtype=bool)
+        keep[np.unique(str_codes, return_index=True)[1]] = True
+        if self._code2index:
+            keep &= ~np.isin(str_codes, np.array(list(self._code2index), dtype=str))
+        if not keep.all():
+            redefined = str_codes[~keep]
+            logging.error(f'Redefined error. {len(redefined)} codes exist: {", ".join(redefined[:10])}'
+                          f'{" ..." if len(redefined) > 10 else ""}')
+
+        rows = np.flatnonzero(keep)
+        row_classes = [classes[i] for i in rows]
+        defaults = {t: self._init_defaults(t) for t in set(row_classes)}
+        fields = list(dict.fromkeys(k for t in defaults for k in defaults[t]))
+
+        def _values(k):
+            if k not in columns:
+                return [defaults[t].get(k) for t in row_classes]
+            column = columns[k]
+            if isinstance(column, np.ndarray) and column.ndim == 1:
+                return column[rows].tolist()
+            return [column[i] for i in rows]
+
+        items = [t.__new__(t) for t in row_classes]
+        for k in fields:
+            if k in _REFERENCES:
+                continue
+            values = _values(k)
+            if k in ('code', 'name', 'name_en'):
+                values = map(intern_str, values)
+            for item, t, v in zip(items, row_classes, values):
+                if k in defaults[t]:
+                    setattr(item, k, v)
+
+        start = len(self._data)
+        for index, item in enumerate(items, start):
+            self._code2index[item.code] = index
+            item.id = index
+            self._type_buckets[item.__class__].append(index)
+            self._code2item[item.code] = item
+            self._name2item[item.name].append(item)
+        self._data.extend(items)
+        self._type_views.clear()
+
+        # references are resolved once the whole batch is registered, so that items of the batch can refer to
+        # each other
+        for k in _REFERENCES:
+            if k not in fields:
+                continue
+            for item, t, v in zip(items, row_classes, _values(k)):
+                if k not in defaults[t]:
+                    continue
+                if k == 'contain_entities':
+                    _assign(item, k, tuple(self._reference(i) for i in v))
+                else:
+                    _assign(item, k, self._reference(v))
+
+        for index, item in enumerate(items, start):
+            self._wait_lazy(index, item)
+            self._link_parent(index, item)
+            self._link_belong_to(index, item)
+            self._link_endpoints(index, item)
+        for item in items:
+            self._resolve_waiting(item)
+        self._version += 1
+        return items
+
+    def from_frames(self, frames: Iterable[Tuple[Union[type, Sequence[type]], "pd.DataFrame"]]
+                    ) -> List["KnowsysAllType"]:
+        """
+        `bulk_add` for each (class, data frame) pair, then resolves the lazy references left.
+        """
+        res = []
+        for knowsys_type_class, frame in frames:
+            res.extend(self.bulk_add(knowsys_type_class, {k: frame[k].to_numpy() for k in frame.columns}))
+        self.check_lazy()
+        return res
+
     def lazy_get(self, code: str = None, name: str = None):
         if code is not None:
             res = self.get(code)
@@ -227,13 +968,17 @@ class KnowsysCollection(_KnowsysCollection):
         return res
 
     def check_lazy(self):
-        for item in self._data:
-            for k, v in item.__dict__.items():
-                if isinstance(v, _LazyLoadType):
-                    real_v = v.real()
-                    if real_v is None:
-                        logging.warning(f'Cannot found knowsys item: `{v.code}`.')
-                    setattr(item, k, real_v)
+        """
+        the lazy references are resolved as soon as their target is added, this reports the ones still dangling
+        and sets them to None.
+        """
+        waiting, self._waiting = self._waiting, defaultdict(list)
+        for (by, target), waiters in waiting.items():
+            for index, attr, pos in waiters:
+                real_v = self.get(target) if by == 'code' else self.find_name(target, findall=False)
+                if real_v is None:
+                    logging.warning(f'Cannot found knowsys item: `{target}`.')
+                self._set_reference(index, attr, pos, real_v)
 
 
 knowsys_collection = KnowsysCollection()
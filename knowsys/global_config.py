@@ -4,4 +4,12 @@ import os
 configs = {
     'SQL_ENV': os.environ.get('SQL_ENV', 'test'),
     'KNOWSYS_LOAD_FROM_SQL': bool(int(os.environ.get('KNOWSYS_LOAD_FROM_SQL', '0'))),
+    'KNOWSYS_MYSQL_HOST': os.environ.get('KNOWSYS_MYSQL_HOST', '127.0.0.1'),
+    'KNOWSYS_MYSQL_PORT': int(os.environ.get('KNOWSYS_MYSQL_PORT', '3306')),
+    'KNOWSYS_MYSQL_USER': os.environ.get('KNOWSYS_MYSQL_USER', ''),
+    'KNOWSYS_MYSQL_PASSWD': os.environ.get('KNOWSYS_MYSQL_PASSWD', ''),
+    'KNOWSYS_SQL_POOL_SIZE': int(os.environ.get('KNOWSYS_SQL_POOL_SIZE', '4')),
+    'KNOWSYS_SQL_CHUNK_SIZE': int(os.environ.get('KNOWSYS_SQL_CHUNK_SIZE', '10000')),
+    'KNOWSYS_TABLE_CACHE_DIR': os.environ.get(
+        'KNOWSYS_TABLE_CACHE_DIR', os.path.join(os.path.split(__file__)[0], 'cached_data', '.table_cache')),
 }
@@ -1,235 +1,206 @@
 import logging
 import os
 
-import numpy as np
-import pandas as pd
-
 from typing import *
 from knowsys.types import *
+from knowsys.types.property_type import PropertyType
 from knowsys.enums import Direction
-from utils.sql_loader import auto_load_table_from_sql
+from knowsys.collection import knowsys_collection, KnowsysCollection
+from knowsys.global_config import configs
+from knowsys.loader_from_files import init_roots
 
-from global_config import KNOWSYS_LOAD_FROM_SQL as LOAD_FROM_SQL
+if TYPE_CHECKING:
+    from knowsys.utils.sql_loader import ConnectionPool
 
+LOAD_FROM_SQL = configs['KNOWSYS_LOAD_FROM_SQL']
 
 base_data_dir = os.path.join(os.path.split(__file__)[0], 'cached_data/')
 
+__knowsys_version__ = 1
 
-# ##################### load entity ############################
-root = KnowsysItem('root', code='1011000000000006')
-term_collection.append(root)
-
-data = auto_load_table_from_sql(base_data_dir, 'knowsys_', 'ks_system_category',
-                                LOAD_FROM_SQL, 'knowsys_',
-                                converters={'category_code': str, 'parent_category_code': str})
-
-entity_root = EntityType('实体', '105100000000000a')
-entity_root.parent = root
-term_collection.append(entity_root)
-
-relation_root = Relation('关系',
-                         term_collection.find_term_by_code('105100000000000a'),  # noqa
-                         term_collection.find_term_by_code('105100000000000a'),  # noqa
-                         code='109500000000000b')
-relation_root.parent = root
-term_collection.append(relation_root)
-
-
-def load_entity(code):
-    item = data[data['category_code'] == code].iloc[0]
-    if term_collection.find_term_by_code(code):
-        return term_collection.find_term_by_code(code)
-    if item.category_full_name_cn.startswith('实体'):
-        parent = term_collection.find_term_by_code(item.parent_category_code)
-        if parent is None:
-            parent = load_entity(item.parent_category_code)
-        res = EntityType(item.category_name_cn, item.category_code, parent)
-        term_collection.append(res)
-        return res
-
-
-for item in list(data.iloc)[2:]:
-    load_entity(item.category_code)
-
-
-# ##################### load relation ############################
-
-
-def load_relation(code):
-    item = data[data['category_code'] == code].iloc[0]
-    if term_collection.find_term_by_code(code):
-        return term_collection.find_term_by_code(code)
-
-    if item.category_full_name_cn.startswith('关系'):
-        parent = term_collection.find_term_by_code(item.parent_category_code)
-        if parent is None:
-            load_relation(item.parent_category_code)
-            parent = term_collection.find_term_by_code(item.parent_category_code)
 
+def _parent_first(by_code: Dict[str, Any], rows: Iterable[Any], accept: Callable[[Any], bool]) -> Iterator[Any]:
+    """
+    yields the accepted category rows in table order, each one after its ancestors not yet in the knowledge system.
+
+    :param by_code: category rows by `category_code`, a parent missing from it is left to the knowledge system
+    """
+    seen = set()
+    for item in rows:
+        chain = []
+        while (item is not None and item.category_code not in seen and accept(item)
+               and knowsys_collection.get(item.category_code) is None):
+            seen.add(item.category_code)
+            chain.append(item)
+            item = by_code.get(item.parent_category_code)
+        yield from reversed(chain)
+
+
+def load_from_sql(data_dir: str = base_data_dir, force_update: bool = LOAD_FROM_SQL,
+                  db_name: str = 'knowsys_', pool: Optional["ConnectionPool"] = None) -> KnowsysCollection:
+    """
+    builds the knowledge system from the knowsys database tables, cached as excel files in `data_dir`.
+
+    :param force_update: download the tables again even if they are cached
+    :param pool: reads on this connection pool instead of the mysql pool of `db_name`, e.g. a sqlite stand-in
+    """
+    from knowsys.utils.sql_loader import auto_load_tables_from_sql, TableSpec
+
+    specs = [
+        TableSpec('ks_system_category',
+                  ('category_code', 'parent_category_code', 'category_full_name_cn', 'category_name_cn',
+                   'category_name'),
+                  converters={'category_code': str, 'parent_category_code': str},
+                  key='id', updated='modify_time'),
+        TableSpec('ks_system_direction',
+                  ('direction_code', 'category_code', 'reverse_expression', 'origin', 'destination',
+                   'reversed', 'directed'),
+                  converters={'category_code': str, 'direction_code': str},
+                  key='id', updated='modify_time'),
+        TableSpec('ks_system_category_statement',
+                  ('statement_code', 'statement_content', 'statement_level', 'direction_code',
+                   'parent_statement_code'),
+                  (('del_stat', '=', 0),),
+                  key='id', updated='modify_time'),
+        TableSpec('ks_system_entity',
+                  ('entity_code', 'entity_name', 'category_code', 'parent_entity_code'),
+                  (('version_name', '=', 'Standard'),),
+                  converters={'category_code': str, 'entity_code': str, 'parent_entity_code': str},
+                  key='id', updated='modify_time'),
+        TableSpec('ks_system_property',
+                  ('property_code', 'property_name_cn', 'property_name', 'category_code'),
+                  converters={'category_code': str},
+                  key='id', updated='modify_time'),
+        TableSpec('ks_system_property_expression',
+                  ('property_code', 'expression_code', 'expression_content'),
+                  (('expression_level', '=', 1),),
+                  converters={'property_code': str, 'expression_code': str},
+                  key='id', updated='modify_time'),
+    ]
+    data_tables = auto_load_tables_from_sql(data_dir, db_name, specs, force_update, 'knowsys_', pool)
+
+    init_roots()
+
+    # ##################### load entity ############################
+
+    data = data_tables['ks_system_category']
+    rows = list(data.itertuples(index=False))
+    by_code = {}
+    for item in rows:
+        by_code.setdefault(item.category_code, item)
+
+    def is_entity(item):
+        return item.category_full_name_cn.startswith('实体')
+
+    for item in _parent_first(by_code, rows[2:], is_entity):
+        EntityType(item.category_code, item.category_name_cn, item.category_name,
+                   knowsys_collection.get(item.parent_category_code))
+
+    # ##################### load relation ############################
+
+    def is_relation(item):
+        return item.category_full_name_cn.startswith('关系')
+
+    for item in _parent_first(by_code, rows[3:], is_relation):
         from_to = item.category_full_name_cn.split('/')
         if len(from_to) > 1:
             from_term_str, to_item_str = from_to[1].split('-')
         else:
             from_term_str, to_item_str = None, None
 
-        res = Relation(item.category_name_cn,
-                       term_collection.find_terms_by_name(from_term_str)[0],  # noqa
-                       term_collection.find_terms_by_name(to_item_str)[0],    # noqa
-                       Direction.UNKNOWN,
-                       item.category_code,
-                       parent)  # noqa
-        term_collection.append(res)
-
+        RelationType(item.category_code,
+                     '/'.join(from_to[1:]),
+                     item.category_name,
+                     knowsys_collection.get(item.parent_category_code),
+                     contain_entities=(knowsys_collection.find_name(from_term_str, findall=False),
+                                       knowsys_collection.find_name(to_item_str, findall=False)),
+                     direction=Direction.UNKNOWN)
 
-for item in list(data.iloc)[3:]:
-    load_relation(item.category_code)
+    # ##################### load direction ############################
 
+    data = data_tables['ks_system_direction']
 
-# ##################### load direction ############################
+    direction_num_str_mapping = {
+        (0, 1): "正向",
+        (1, 1): "反向",
+        (0, 0): "双向",
+    }
 
+    for item in data.iloc:
+        parent = knowsys_collection.get(item.category_code)
+        if parent is None:
+            logging.warning(f'cannot found code: {item.category_code}')
+            continue
+        RelationType(item.direction_code,
+                     item.reverse_expression,
+                     '', parent,
+                     (knowsys_collection.get(item.origin),
+                      knowsys_collection.get(item.destination)),
+                     Direction.from_str(direction_num_str_mapping[(item.reversed, item.directed)]))
+
+    # ##################### load relation term ############################
+
+    data = data_tables['ks_system_category_statement']
+
+    l1_data = data[data["statement_level"] == 1]
+    for item in l1_data.iloc:
+        belong_to = knowsys_collection.get(item.direction_code)
+        if belong_to is None:
+            continue
+        RelationTermType(item.statement_code, item.statement_content, '', None, belong_to)
+
+    for level in range(2, max(data["statement_level"]) + 1):
+        tmp_data = data[data["statement_level"] == level]
+        for item in tmp_data.iloc:
+            parent = knowsys_collection.get(item.parent_statement_code)
+            if parent is None:
+                continue
+            parent.create_child(item.statement_content, item.statement_code)
+
+    # ##################### load entity term ############################
+
+    data = data_tables['ks_system_entity']
+    l1_data = data[data['parent_entity_code'] == '0000000000']
+    for item in l1_data.iloc:
+        belong_to = knowsys_collection.get(item.category_code)
+        EntityTermType(item.entity_code, item.entity_name, '', None, belong_to)
+
+    other_data = data[(data['parent_entity_code'] != '0000000000') & (data['parent_entity_code'] != '/')]
+    for item in other_data.iloc:
+        parent = knowsys_collection.get(item.parent_entity_code)
+        if parent is None:
+            continue
+        parent.create_child(item.entity_name, item.entity_code)
 
-data = auto_load_table_from_sql(base_data_dir, 'knowsys_', 'ks_system_direction',
-                                LOAD_FROM_SQL, 'knowsys_',
-                                converters={'category_code': str, 'direction_code': str})
-# data = data[data["del_stat"] == 0]
+    # ##################### load property ############################
 
-direction_num_str_mapping = {
-    (0, 1): "正向",
-    (1, 1): "反向",
-    (0, 0): "双向",
-}
+    data = data_tables['ks_system_property']
 
-direction_map = {}
-for item in data.iloc:
-    if term_collection.find_term_by_code(item.category_code) is None:
-        print(f'cannot found code: {item.category_code}')
-        continue
-    parent = term_collection.find_term_by_code(item.category_code)
-    child = parent.create_relation(parent.name + '_' + direction_num_str_mapping[(item.reversed, item.directed)],
-                                   Direction.from_str(direction_num_str_mapping[(item.reversed, item.directed)]),
-                                   parent.from_entity, parent.to_entity,
-                                   code=item.direction_code)
-    term_collection.append(child)
-
-
-# ##################### load relation term ############################
-
-
-data = auto_load_table_from_sql(base_data_dir, 'knowsys_', 'ks_system_category_statement',
-                                LOAD_FROM_SQL, 'knowsys_',
-                                converters={'category_code': str})
-data = data[data["del_stat"] == 0]
-
-# for level in range(1, max(data['statement_level']) + 1):
-l1_data = data[data["statement_level"] == 1]
-
-
-for item in l1_data.iloc:
-    parent = term_collection.find_term_by_code(item.direction_code)
-    if parent is None:
-        continue
-    child = parent.create_term(item.statement_content, code=item.statement_code)
-    term_collection.append(child)
-
-for level in range(2, max(data["statement_level"]) + 1):
-    tmp_data = data[data["statement_level"] == level]
-    for item in tmp_data.iloc:
-        # direction_str_term = direction_map.get(item.direction_code)
-        # if direction_str_term is None:
-        #     continue
-        parent = term_collection.find_term_by_code(item.parent_statement_code)
-        child = parent.create_child_term(item.statement_content, code=item.statement_code)
-        term_collection.append(child)
-
-
-# ##################### load entity term ############################
-
-data = auto_load_table_from_sql(base_data_dir, 'knowsys_', 'ks_system_entity',
-                                LOAD_FROM_SQL, 'knowsys_',
-                                converters={'category_code': str, 'entity_code': str, 'parent_entity_code': str})
-# data = data[(data["del_stat"] == 0)]
-data = data[(data['version_name'] == 'Standard')]
-l1_data = data[data['parent_entity_code'] == '0000000000']
-for item in l1_data.iloc:
-    parent = term_collection.find_term_by_code(code=item.category_code)
-    child = parent.create_term(item.entity_name, item.entity_code)
-    term_collection.append(child)
-
-other_data = data[(data['parent_entity_code'] != '0000000000') & (data['parent_entity_code'] != '/')]
-for item in other_data.iloc:
-    parent = term_collection.find_term_by_code(code=item.parent_entity_code)
-    if parent is None:
-        continue
-    child = parent.create_child_term(item.entity_name, item.entity_code)
-    term_collection.append(child)
-
-
-# ##################### load property ############################
-
-
-data = auto_load_table_from_sql(base_data_dir, 'knowsys_', 'ks_system_property',
-                                LOAD_FROM_SQL, 'knowsys_',
-                                converters={'category_code': str, 'entity_code': str, 'parent_entity_code': str})
-
-# data = data[(data["del_stat"] == 0)]
-
-for item in data.iloc:
-    parent = term_collection.find_term_by_code(code=item.category_code)
-    if parent is None:
-        continue
-    if isinstance(item.attributes, str):
-        attrs = [i.strip() for i in item.attributes.split(',')]
-    else:
-        attrs = item.attributes if not np.isnan(item.attributes) else []
-    prop = parent.create_property(item.property_name_cn, item.property_code, None, item.property_name, item.attributes)
-    term_collection.append(prop)
-
-
-# ##################### load property term ############################
-
-
-data = auto_load_table_from_sql(base_data_dir, 'knowsys_', 'ks_system_property_expression',
-                                LOAD_FROM_SQL, 'knowsys_',
-                                converters={'category_code': str, 'property_code': str,
-                                            'parent_expression_code': str, 'expression_code': str})
-# data = data[(data["del_stat"] == 0)]
-data = data[(data['expression_level'] == 1)]
-
-l1_data = data[data['parent_expression_code'] == data['property_code']]
-for item in l1_data.iloc:
-    parent = term_collection.find_term_by_code(code=item.property_code)
-    if parent is None:
-        # print(f'cannot found property: {item.property_code}')
-        continue
-    if not isinstance(parent, Property):
-        # print(f'{item.property_code} is not a property')
-        continue
-    new_prop = parent.create_child(item.expression_content, item.expression_code)
-    term_collection.append(new_prop)
-
-other_data = data[data['parent_expression_code'] != data['property_code']]
-for item in other_data.iloc:
-    parent = term_collection.find_term_by_code(code=item.property_code)
-    if parent is None:
-        # print(f'cannot found property: {item.property_code}')
-        continue
-    if not isinstance(parent, Property):
-        print(f'{item.property_code} is not a property')
-        continue
-    new_prop = parent.create_child(item.expression_content, item.expression_code)
-    term_collection.append(new_prop)
+    for item in data.iloc:
+        belong_to = knowsys_collection.get(item.category_code)
+        if isinstance(belong_to, EntityType):
+            EntityPropertyType(item.property_code, item.property_name_cn, item.property_name, None, belong_to)
+        elif isinstance(belong_to, RelationType):
+            RelationPropertyType(item.property_code, item.property_name_cn, item.property_name, None, belong_to)
 
+    # ##################### load property term ############################
 
-__knowsys_version__ = 1
-
-__all__ = ['root', 'entity_root', 'relation_root', '__knowsys_version__']
+    data = data_tables['ks_system_property_expression']
 
+    for item in data.iloc:
+        parent = knowsys_collection.get(item.property_code)
+        if parent is None:
+            continue
+        if not isinstance(parent, PropertyType):
+            logging.warning(f'{item.property_code} is not a property')
+            continue
+        parent.create_child(item.expression_content, item.expression_code)
 
-########## checking ###############
+    # ########## checking ###############
 
+    for relation_meta in knowsys_collection.relation_root.contains():
+        for relation in relation_meta.contains():
+            if len(relation.terms_with_children()) == 0:
+                logging.warning(f'[knowsys_]: relation: `{relation}` have no terms.')
 
-for relation_meta in relation_root:
-    for relation in relation_meta:
-        all_term_length = len(relation.terms_with_children)
-        if all_term_length == 0:
-            logging.warning(f'[knowsys_]: relation: `{relation}` have no terms.')
+    return knowsys_collection
@@ -1,135 +1,264 @@
+import glob
+import hashlib
 import logging
 import os
+import time
 
-import numpy as np
-import pandas as pd
-
+from concurrent.futures import ProcessPoolExecutor
 from typing import *
 from knowsys.types import *
 from knowsys.enums import Direction
-from knowsys.collection import knowsys_collection
+from knowsys.collection import knowsys_collection, KnowsysCollection
+from knowsys.global_config import configs
 
+if TYPE_CHECKING:
+    import pandas as pd
 
 base_data_dir = os.path.join(os.path.split(__file__)[0], 'cached_data/')
 
-# ##################### init ############################
-
-root = KnowsysType(code='1011000000000006', name='知识体系', name_en='root')
-entity_type_root = EntityType('105100000000000a', '实体', 'entity', root)
-relation_type_root = RelationType('109500000000000b', '关系', 'relation', root,
-                                  contain_entities=(entity_type_root, entity_type_root))
-
-setattr(knowsys_collection, 'root', root)
-setattr(knowsys_collection, 'relation_root', relation_type_root)
-setattr(knowsys_collection, 'entity_root', entity_type_root)
-
-# ##################### load entity_type / relation_type ############################
-
-data = pd.read_excel(os.path.join(base_data_dir, 'ks_system_category.xlsx'),
-                     converters={'category_code': str, 'parent_category_code': str})
-
-for item in list(data.iloc)[3:]:
-    if item.category_full_name_cn.startswith('实体'):
-        EntityType(item.category_code,
-                   item.category_name_cn,
-                   item.category_name,
-                   knowsys_collection.lazy_get(item.parent_category_code))
-    elif item.category_full_name_cn.startswith('关系'):
-        relation_con_entities: List[str] = item.category_full_name_cn.split('/')[1].split('-')
-        relation_name = '/'.join(item.category_full_name_cn.split('/')[1:])
-        RelationType(item.category_code,
-                     relation_name,  # item.category_name_cn
-                     item.category_name,
-                     knowsys_collection.lazy_get(item.parent_category_code),
-                     contain_entities=(knowsys_collection.lazy_get(name=relation_con_entities[0]),
-                                       knowsys_collection.lazy_get(name=relation_con_entities[1])),
-                     direction=Direction.UNKNOWN)
-knowsys_collection.check_lazy()
-
-# ##################### load relation type with direction ############################
-
-data = pd.read_excel(os.path.join(base_data_dir, 'ks_system_direction.xlsx'),
-                     converters={'category_code': str, 'direction_code': str})
-
-direction_num_str_mapping = {
-    (0, 1): "正向",
-    (1, 1): "反向",
-    (0, 0): "双向",
+tables = {
+    'ks_system_category': {'category_code': str, 'parent_category_code': str},
+    'ks_system_direction': {'category_code': str, 'direction_code': str},
+    'ks_system_entity': {'category_code': str, 'entity_code': str, 'parent_entity_code': str},
+    'ks_system_category_statement': {'category_code': str},
+    'ks_system_property': {'category_code': str, 'entity_code': str, 'parent_entity_code': str},
+    'ks_system_property_expression': {'category_code': str, 'property_code': str,
+                                      'parent_expression_code': str, 'expression_code': str},
 }
 
-for item in data.iloc:
-    parent = knowsys_collection.get(item.category_code)
-    RelationType(item.direction_code,
-                 item.reverse_expression,
-                 '', parent,
-                 (knowsys_collection.get(item.origin),
-                  knowsys_collection.get(item.destination)),
-                 Direction.from_str(direction_num_str_mapping[(item.reversed, item.directed)]))
-
-# ##################### load entity_term ############################
-
-data = pd.read_excel(os.path.join(base_data_dir, 'ks_system_entity.xlsx'),
-                     converters={'category_code': str, 'entity_code': str, 'parent_entity_code': str})
-data = data[(data['version_name'] == 'Standard')]
-l1_data = data[data['parent_entity_code'] == '0000000000']
-for item in l1_data.iloc:
-    EntityTermType(item.entity_code,
-                   item.entity_name,
-                   '', None,
-                   knowsys_collection.lazy_get(item.category_code))
-
-other_data = data[(data['parent_entity_code'] != '0000000000') & (data['parent_entity_code'] != '/')]
-for item in other_data.iloc:
-    EntityTermType(item.entity_code,
-                   item.entity_name,
-                   '',
-                   knowsys_collection.lazy_get(item.parent_entity_code),
-                   knowsys_collection.lazy_get(item.category_code))
-knowsys_collection.check_lazy()
-
-# ##################### load relation term ############################
-
-data = pd.read_excel(os.path.join(base_data_dir, 'ks_system_category_statement.xlsx'),
-                     converters={'category_code': str})
-data = data[data["del_stat"] == 0]
-for item in data.iloc:
-    RelationTermType(item.statement_code, item.statement_content,
-                     '', None,
-                     knowsys_collection.lazy_get(item.parent_statement_code))
-
-knowsys_collection.check_lazy()
-
-# ##################### load properties ############################
-
-data = pd.read_excel(os.path.join(base_data_dir, 'ks_system_property.xlsx'),
-                     converters={'category_code': str, 'entity_code': str, 'parent_entity_code': str})
-for item in data.iloc:
-    belong_to = knowsys_collection.get(item.category_code)
-    if isinstance(belong_to, EntityType):
-        EntityPropertyType(item.property_code, item.property_name_cn,
-                           item.property_name, None,
-                           belong_to=belong_to)
-    elif isinstance(belong_to, RelationType):
-        RelationPropertyType(item.property_code, item.property_name_cn,
-                             item.property_name, None,
-                             belong_to=belong_to)
-
-# ##################### load property terms ############################
-
-data = pd.read_excel(os.path.join(base_data_dir, 'ks_system_property_expression.xlsx'),
-                     converters={'category_code': str, 'property_code': str,
-                                 'parent_expression_code': str, 'expression_code': str})
-for item in data.iloc:
-    belong_to = knowsys_collection.get(item.property_code)
-    if item.expression_level == 1:
-        parent = None
+# bumped when the pickled tables change shape, older cache files are not read any more
+_CACHE_FORMAT = 1
+
+ROOT_CODE = '1011000000000006'
+ENTITY_ROOT_CODE = '105100000000000a'
+RELATION_ROOT_CODE = '109500000000000b'
+
+
+def init_roots():
+    root = KnowsysType(code=ROOT_CODE, name='知识体系', name_en='root')
+    entity_type_root = EntityType(ENTITY_ROOT_CODE, '实体', 'entity', root)
+    RelationType(RELATION_ROOT_CODE, '关系', 'relation', root,
+                 contain_entities=(entity_type_root, entity_type_root))
+    bind_roots(knowsys_collection)
+
+
+def bind_roots(collection: KnowsysCollection):
+    setattr(collection, 'root', collection.get(ROOT_CODE))
+    setattr(collection, 'relation_root', collection.get(RELATION_ROOT_CODE))
+    setattr(collection, 'entity_root', collection.get(ENTITY_ROOT_CODE))
+
+
+def _cache_path(cache_dir: str, excel_path: str, converters: Dict[str, Callable]) -> str:
+    """
+    the pickle of an excel file, keyed by everything that changes the parsed table: the file, the converters
+    given to `read_excel`, the pandas version and `_CACHE_FORMAT`.
+    """
+    import pandas as pd
+
+    stat = os.stat(excel_path)
+    converter_key = ','.join(f'{column}:{getattr(converter, "__module__", "")}.'
+                             f'{getattr(converter, "__qualname__", repr(converter))}'
+                             for column, converter in sorted(converters.items()))
+    key = (f'{os.path.abspath(excel_path)}|{stat.st_mtime_ns}|{stat.st_size}|{converter_key}|'
+           f'{pd.__version__}|{_CACHE_FORMAT}')
+    name = os.path.splitext(os.path.basename(excel_path))[0]
+    return os.path.join(cache_dir, f'{name}.{hashlib.sha1(key.encode("utf8")).hexdigest()[:16]}.pkl')
+
+
+def _remove_stale_caches(cache_path: str):
+    # the pickles of older versions of the same excel file
+    directory, filename = os.path.split(cache_path)
+    name = filename.split('.')[0]
+    for path in glob.glob(os.path.join(glob.escape(directory), f'{glob.escape(name)}.*.pkl')):
+        if os.path.basename(path) != filename:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.warning(f'[knowsys]: cannot remove the stale cache `{path}`: {e}')
+
+
+def _read_excel(excel_path: str, converters: Dict[str, Callable], cache_path: Optional[str]):
+    import pandas as pd
+
+    start = time.perf_counter()
+    data = pd.read_excel(excel_path, converters=converters)
+    if cache_path is not None:
+        try:
+            data.to_pickle(cache_path)
+        except OSError as e:
+            logging.warning(f'[knowsys]: cannot cache `{excel_path}`: {e}')
+        else:
+            _remove_stale_caches(cache_path)
+    return data, time.perf_counter() - start
+
+
+def read_tables(data_dir: str = base_data_dir, cache_dir: Optional[str] = configs['KNOWSYS_TABLE_CACHE_DIR'],
+                max_workers: Optional[int] = None) -> Dict[str, "pd.DataFrame"]:
+    """
+    reads the knowsys excel files of `data_dir`, the files are parsed in parallel processes.
+
+    :param cache_dir: parsed tables are pickled here, keyed by the path, mtime and size of the excel file and
+                      by how it is parsed, so unchanged files are never parsed again. `None` disables the cache.
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    if cache_dir is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            logging.warning(f'[knowsys]: table cache disabled, cannot create `{cache_dir}`: {e}')
+            cache_dir = None
+
+    res, to_parse = {}, {}
+    for name, converters in tables.items():
+        excel_path = os.path.join(data_dir, f'{name}.xlsx')
+        cache_path = _cache_path(cache_dir, excel_path, converters) if cache_dir is not None else None
+        if cache_path is not None and os.path.exists(cache_path):
+            table_start = time.perf_counter()
+            res[name] = pd.read_pickle(cache_path)
+            logging.info(f'[knowsys]: {name} loaded from cache in {time.perf_counter() - table_start:.3f}s')
+        else:
+            to_parse[name] = (excel_path, converters, cache_path)
+
+    if len(to_parse) == 1:
+        parsed = {name: _read_excel(*args) for name, args in to_parse.items()}
+    elif to_parse:
+        with ProcessPoolExecutor(max_workers=max_workers or min(len(to_parse), os.cpu_count() or 1)) as pool:
+            futures = {name: pool.submit(_read_excel, *args) for name, args in to_parse.items()}
+            parsed = {name: future.result() for name, future in futures.items()}
     else:
-        parent = knowsys_collection.lazy_get(item.parent_expression_code)
-    if isinstance(belong_to, EntityType):
-        EntityPropertyType(item.expression_code, item.expression_content,
-                           '', parent, belong_to)
-    elif isinstance(belong_to, RelationType):
-        RelationPropertyType(item.expression_code, item.expression_content,
-                             '', parent, belong_to)
+        parsed = {}
+    for name, (data, seconds) in parsed.items():
+        res[name] = data
+        logging.info(f'[knowsys]: {name} parsed from excel in {seconds:.3f}s')
+
+    logging.info(f'[knowsys]: {len(res)} tables read in {time.perf_counter() - start:.3f}s '
+                 f'({len(parsed)} parsed, {len(res) - len(parsed)} cached)')
+    return res
+
+
+def load_from_files(data_dir: str = base_data_dir,
+                    cache_dir: Optional[str] = configs['KNOWSYS_TABLE_CACHE_DIR']) -> KnowsysCollection:
+    import numpy as np
+    import pandas as pd
+
+    data_tables = read_tables(data_dir, cache_dir)
+    get, lazy_get = knowsys_collection.get, knowsys_collection.lazy_get
+
+    def _property_classes(belong_to: List[Optional[KnowsysType]]) -> np.ndarray:
+        return np.array([EntityPropertyType if isinstance(b, EntityType) else
+                         RelationPropertyType if isinstance(b, RelationType) else None for b in belong_to])
+
+    # ##################### init ############################
+
+    init_roots()
+
+    # ##################### load entity_type / relation_type ############################
+
+    data = data_tables['ks_system_category'].iloc[3:]
+    full_names = data['category_full_name_cn']
+    is_relation = full_names.str.startswith('关系').to_numpy(dtype=bool)
+    data = data[full_names.str.startswith('实体').to_numpy(dtype=bool) | is_relation]
+    is_relation = data['category_full_name_cn'].str.startswith('关系').to_numpy(dtype=bool)
+    paths = data['category_full_name_cn'].str.split('/').tolist()
+
+    knowsys_collection.bulk_add(
+        np.where(is_relation, RelationType, EntityType),
+        {'code': data['category_code'],
+         'name': np.where(is_relation, ['/'.join(path[1:]) for path in paths], data['category_name_cn']),
+         'name_en': data['category_name'],
+         'parent': data['parent_category_code'],
+         'contain_entities': [tuple(lazy_get(name=name) for name in path[1].split('-')[:2]) if relation
+                              else (None, None) for relation, path in zip(is_relation, paths)],
+         'direction': [Direction.UNKNOWN] * len(data)})
+    knowsys_collection.check_lazy()
+
+    # ##################### load relation type with direction ############################
+
+    data = data_tables['ks_system_direction']
+
+    direction_num_str_mapping = {
+        (0, 1): "正向",
+        (1, 1): "反向",
+        (0, 0): "双向",
+    }
+
+    knowsys_collection.bulk_add(
+        RelationType,
+        {'code': data['direction_code'],
+         'name': data['reverse_expression'],
+         'name_en': [''] * len(data),
+         'parent': [get(code) for code in data['category_code']],
+         'contain_entities': [(get(origin), get(destination))
+                              for origin, destination in zip(data['origin'], data['destination'])],
+         'direction': [Direction.from_str(direction_num_str_mapping[key])
+                       for key in zip(data['reversed'], data['directed'])]})
+
+    # ##################### load entity_term ############################
+
+    data = data_tables['ks_system_entity']
+    data = data[(data['version_name'] == 'Standard')]
+    l1_data = data[data['parent_entity_code'] == '0000000000']
+    other_data = data[(data['parent_entity_code'] != '0000000000') & (data['parent_entity_code'] != '/')]
+    knowsys_collection.from_frames([
+        (EntityTermType, pd.DataFrame({'code': l1_data['entity_code'],
+                                       'name': l1_data['entity_name'],
+                                       'name_en': '',
+                                       'belong_to': l1_data['category_code']})),
+        (EntityTermType, pd.DataFrame({'code': other_data['entity_code'],
+                                       'name': other_data['entity_name'],
+                                       'name_en': '',
+                                       'parent': other_data['parent_entity_code'],
+                                       'belong_to': other_data['category_code']})),
+    ])
+
+    # ##################### load relation term ############################
+
+    data = data_tables['ks_system_category_statement']
+    data = data[data["del_stat"] == 0]
+    knowsys_collection.from_frames([
+        (RelationTermType, pd.DataFrame({'code': data['statement_code'],
+                                         'name': data['statement_content'],
+                                         'name_en': '',
+                                         'belong_to': data['parent_statement_code']})),
+    ])
+
+    # ##################### load properties ############################
+
+    data = data_tables['ks_system_property']
+    belong_to = [get(code) for code in data['category_code']]
+    classes = _property_classes(belong_to)
+    mask = classes != None  # noqa
+    knowsys_collection.bulk_add(
+        classes[mask],
+        {'code': data['property_code'][mask],
+         'name': data['property_name_cn'][mask],
+         'name_en': data['property_name'][mask],
+         'belong_to': [b for b, m in zip(belong_to, mask) if m]})
+
+    # ##################### load property terms ############################
+
+    data = data_tables['ks_system_property_expression']
+    belong_to = [get(code) for code in data['property_code']]
+    classes = _property_classes(belong_to)
+    mask = classes != None  # noqa
+    data = data[mask]
+    knowsys_collection.bulk_add(
+        classes[mask],
+        {'code': data['expression_code'],
+         'name': data['expression_content'],
+         'name_en': [''] * len(data),
+         'parent': data['parent_expression_code'].where(data['expression_level'] != 1, None),
+         'belong_to': [b for b, m in zip(belong_to, mask) if m]})
+
+    return knowsys_collection
 
 
+def __getattr__(name):
+    # the roots used to be built when importing this module, they are now built on first access
+    attrs = {'root': 'root', 'entity_type_root': 'entity_root', 'relation_type_root': 'relation_root'}
+    if name in attrs:
+        from knowsys import load_knowsys
+        return getattr(load_knowsys(source='files'), attrs[name])
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
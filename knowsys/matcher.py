@@ -0,0 +1,172 @@
+import os
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import *
+from knowsys.types.property_type import PropertyType
+from knowsys.types.term_type import TermType
+
+if TYPE_CHECKING:
+    from knowsys.collection import KnowsysCollection
+    from knowsys.types.base import KnowsysAllType
+
+Match = Tuple[Tuple[int, int], Tuple["KnowsysAllType", ...]]
+
+
+class _Automaton(object):
+    """
+    an Aho-Corasick automaton over the patterns, holds no knowsys item so it is cheap to send to other processes.
+    `out[state]` are the patterns ending at `state`, longest first.
+    """
+    __slots__ = ('goto', 'fail', 'out', 'lengths')
+
+    def __init__(self, patterns: Sequence[str]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = goto[state][ch] = len(goto)
+                    goto.append({})
+                    out.append([])
+                state = next_state
+            out[state].append(pattern_id)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[next_state] = goto[f].get(ch, 0)
+                out[next_state].extend(out[fail[next_state]])
+
+        self.goto = goto
+        self.fail = fail
+        self.out = [tuple(o) for o in out]
+        self.lengths = [len(pattern) for pattern in patterns]
+
+    def __getstate__(self):
+        return self.goto, self.fail, self.out, self.lengths
+
+    def __setstate__(self, state):
+        self.goto, self.fail, self.out, self.lengths = state
+
+    def scan(self, text: str, longest: bool = False) -> List[Tuple[int, int, int]]:
+        goto, fail, out, lengths = self.goto, self.fail, self.out, self.lengths
+        res = []
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern_id in out[state]:
+                res.append((end - lengths[pattern_id], end, pattern_id))
+        if longest:
+            res = _leftmost_longest(res)
+        return res
+
+
+def _leftmost_longest(matches: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    res = []
+    last_end = 0
+    for start, end, pattern_id in sorted(matches, key=lambda m: (m[0], -m[1])):
+        if start >= last_end:
+            res.append((start, end, pattern_id))
+            last_end = end
+    return res
+
+
+_worker_automaton: Optional[_Automaton] = None
+
+
+def _init_worker(automaton: _Automaton):
+    global _worker_automaton
+    _worker_automaton = automaton
+
+
+def _scan_in_worker(args: Tuple[str, bool]) -> List[Tuple[int, int, int]]:
+    return _worker_automaton.scan(*args)
+
+
+class TermMatcher(object):
+    """
+    finds the names (`name` and `name_en`) of the items of a collection in texts, in a single pass over each text.
+    matches are ((start, end), items), `text[start:end]` is the name shared by the items.
+
+    :param types: only the items of these classes, the terms and the properties by default
+    :param under: only the items of the subtree of this item (an item or a code), and the items belonging to them,
+                  e.g. the terms of the entity types under an entity type
+    """
+
+    def __init__(self, collection: "KnowsysCollection", types: Union[type, Tuple[type, ...]] = (TermType, PropertyType),
+                 under: Union["KnowsysAllType", str] = None):
+        in_scope = self._scope(collection, under)
+        names: Dict[str, List["KnowsysAllType"]] = {}
+        for item in collection.data:
+            if not isinstance(item, types) or not in_scope(item):
+                continue
+            for name in (item.name, item.name_en):
+                if isinstance(name, str) and name:
+                    items = names.setdefault(name, [])
+                    if item not in items:
+                        items.append(item)
+
+        self.names: List[str] = list(names)
+        self.items: List[Tuple["KnowsysAllType", ...]] = [tuple(items) for items in names.values()]
+        self._automaton = _Automaton(self.names)
+
+    @staticmethod
+    def _scope(collection: "KnowsysCollection", under) -> Callable[["KnowsysAllType"], bool]:
+        if under is None:
+            return lambda item: True
+        tin, tout, _ = collection._hierarchy()
+        index = collection._code2index.get(getattr(under, 'code', under))
+        if index is None or tin[index] < 0:
+            return lambda item: False
+        low, high = tin[index], tout[index]
+
+        def in_scope(item):
+            while item is not None:
+                i = collection._indexed(item)
+                if i is not None and low <= tin[i] < high:
+                    return True
+                item = getattr(item, 'belong_to', None)
+            return False
+
+        return in_scope
+
+    def __len__(self):
+        return len(self.names)
+
+    def _to_matches(self, found: List[Tuple[int, int, int]]) -> List[Match]:
+        return [((start, end), self.items[pattern_id]) for start, end, pattern_id in found]
+
+    def match(self, text: str, longest: bool = False) -> List[Match]:
+        """
+        all the occurrences of the names in `text`, by end then longest first, overlapping ones included.
+
+        :param longest: keep the leftmost longest occurrences only, they do not overlap
+        """
+        return self._to_matches(self._automaton.scan(text, longest))
+
+    def match_many(self, texts: Iterable[str], longest: bool = False, max_workers: Optional[int] = None,
+                   chunksize: int = 16) -> List[List[Match]]:
+        """
+        `match` over many texts, spread over a process pool. the automaton is sent once to each process.
+
+        :param max_workers: the number of processes, `1` matches in this process
+        """
+        texts = list(texts)
+        max_workers = max_workers or os.cpu_count() or 1
+        if max_workers == 1 or len(texts) <= 1:
+            return [self.match(text, longest) for text in texts]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(self._automaton,)) as pool:
+            found = pool.map(_scan_in_worker, [(text, longest) for text in texts], chunksize=chunksize)
+            return [self._to_matches(f) for f in found]
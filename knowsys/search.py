@@ -0,0 +1,147 @@
+import bisect
+import unicodedata
+
+import numpy as np
+
+from collections import defaultdict
+from typing import *
+from knowsys.collection import _KnowsysCollection
+
+if TYPE_CHECKING:
+    from knowsys.collection import KnowsysCollection
+    from knowsys.types.base import KnowsysAllType
+
+
+def normalize_name(name) -> str:
+    # full-width and half-width forms, and upper and lower case, compare equal
+    if not isinstance(name, str):
+        return ''
+    return unicodedata.normalize('NFKC', name).casefold().strip()
+
+
+def _grams(key: str, n: int) -> Set[str]:
+    padded = '\x02' * (n - 1) + key + '\x03' * (n - 1)
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def _levenshtein(a: str, b: str, limit: int) -> int:
+    """
+    the edit distance of `a` and `b`, or `limit + 1` as soon as it is known to be larger than `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class NameIndex(object):
+    """
+    a search index over the `name` and `name_en` of the items of a collection, for completion (a sorted array
+    of the names) and typo tolerant search (an n-gram index, the candidates are verified by edit distance).
+    names are compared by `normalize_name`. build it with `KnowsysCollection.name_index()`.
+
+    :param gram: the length of the n-grams of the fuzzy search
+    """
+
+    def __init__(self, collection: "KnowsysCollection", gram: int = 2):
+        self.collection = collection
+        self.version = collection._version
+        self.gram = gram
+
+        data = collection.data
+        entries = set()
+        for pos, item in enumerate(data):
+            for name in (item.name, item.name_en):
+                key = normalize_name(name)
+                if key:
+                    entries.add((key, pos))
+        entries = sorted(entries)
+        self.keys: List[str] = [key for key, _ in entries]
+        self.positions = np.array([pos for _, pos in entries], dtype=np.int64)
+        self.lengths = np.array([len(key) for key in self.keys], dtype=np.int64)
+
+        self.classes = list(dict.fromkeys(item.__class__ for item in data))
+        class_ids = {t: i for i, t in enumerate(self.classes)}
+        self.class_ids = np.array([class_ids[item.__class__] for item in data], dtype=np.int64)
+
+        postings = defaultdict(list)
+        for entry, key in enumerate(self.keys):
+            for g in _grams(key, gram):
+                postings[g].append(entry)
+        self.postings: Dict[str, np.ndarray] = {g: np.array(v, dtype=np.int64) for g, v in postings.items()}
+
+    def _allowed(self, entries: np.ndarray, types, under) -> np.ndarray:
+        positions = self.positions[entries]
+        keep = np.ones(len(entries), dtype=bool)
+        if types is not None:
+            ids = [i for i, t in enumerate(self.classes) if issubclass(t, types)]
+            keep &= np.isin(self.class_ids[positions], ids)
+        if under is not None:
+            tin, tout, _ = self.collection._hierarchy()
+            index = self.collection._code2index.get(getattr(under, 'code', under))
+            if index is None or tin[index] < 0:
+                return np.zeros(len(entries), dtype=bool)
+            keep &= (tin[positions] >= tin[index]) & (tin[positions] < tout[index])
+        return keep
+
+    def complete(self, prefix: str, k: int = 10, types: Union[type, Tuple[type, ...]] = None,
+                 under: Union["KnowsysAllType", str] = None) -> _KnowsysCollection:
+        """
+        the items with a name starting with `prefix`, the shortest names first, then in the order of the collection.
+
+        :param types: only items of these classes
+        :param under: only this item and its descendants, an item or a code
+        """
+        key = normalize_name(prefix)
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + '\U0010ffff', lo)
+        entries = np.arange(lo, hi)
+        entries = entries[self._allowed(entries, types, under)]
+        if len(entries) > 2 * k:
+            # an item has at most two names, the 2k shortest names hold its k best items
+            kth = np.partition(self.lengths[entries], 2 * k - 1)[2 * k - 1]
+            entries = entries[self.lengths[entries] <= kth]
+        entries = entries[np.lexsort((self.positions[entries], self.lengths[entries]))]
+        positions = self.positions[entries]
+        _, first = np.unique(positions, return_index=True)
+        return _KnowsysCollection([self.collection.data[i] for i in positions[np.sort(first)][:k]])
+
+    def fuzzy(self, query: str, k: int = 10, max_distance: int = 1, types: Union[type, Tuple[type, ...]] = None,
+              under: Union["KnowsysAllType", str] = None) -> List[Tuple["KnowsysAllType", int]]:
+        """
+        the items with a name within `max_distance` edits of `query`, as (item, distance) ranked by distance,
+        then by length difference and by the order of the collection. a name must share an n-gram with `query`.
+
+        :param types: only items of these classes
+        :param under: only this item and its descendants, an item or a code
+        """
+        key = normalize_name(query)
+        grams = _grams(key, self.gram)
+        postings = [self.postings[g] for g in grams if g in self.postings]
+        if not key or not postings:
+            return []
+        entries, counts = np.unique(np.concatenate(postings), return_counts=True)
+        # every edit removes at most `gram` of the distinct n-grams of the query
+        need = max(1, len(grams) - max_distance * self.gram)
+        keep = (counts >= need) & (np.abs(self.lengths[entries] - len(key)) <= max_distance)
+        entries = entries[keep]
+        entries = entries[self._allowed(entries, types, under)]
+
+        best: Dict[int, Tuple[int, int]] = {}
+        for entry in entries.tolist():
+            distance = _levenshtein(key, self.keys[entry], max_distance)
+            if distance > max_distance:
+                continue
+            pos = int(self.positions[entry])
+            rank = (distance, abs(len(self.keys[entry]) - len(key)))
+            if pos not in best or rank < best[pos]:
+                best[pos] = rank
+        ranked = sorted(best.items(), key=lambda x: (x[1], x[0]))[:k]
+        return [(self.collection.data[pos], rank[0]) for pos, rank in ranked]
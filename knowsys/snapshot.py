@@ -0,0 +1,400 @@
+import csv
+import json
+import mmap
+import os
+import struct
+import typing
+
+import numpy as np
+
+from typing import *
+
+from knowsys.collection import _KnowsysCollection, _LazyLoadType, _assign, _knowsys_classes, UNBOUND_ID
+from knowsys.enums import Direction
+
+if typing.TYPE_CHECKING:
+    from knowsys.collection import KnowsysCollection
+    from knowsys.types.base import KnowsysAllType
+
+
+# file layout: magic | <format version: u32> <header length: u32> | json header | padding | arrays.
+# every array starts on an `_ALIGNMENT` boundary, its offset in the header is relative to the first one.
+_MAGIC = b'KNOWSYS\x00'
+_FORMAT_VERSION = 1
+_ALIGNMENT = 64
+
+
+def _aligned(size: int) -> int:
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+def _csr(keys: np.ndarray, length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    groups ids `0..len(keys)` by `keys` (-1 is dropped), keeping the id order inside each group.
+
+    :return: (offsets, ids), the group of key `k` is `ids[offsets[k]:offsets[k + 1]]`
+    """
+    ids = np.flatnonzero(keys >= 0)
+    ids = ids[np.argsort(keys[ids], kind='stable')]
+    counts = np.bincount(keys[ids], minlength=length)
+    offsets = np.zeros(length + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return _readonly(offsets), _readonly(ids.astype(np.int64))
+
+
+class StringTable(object):
+    """
+    utf8 strings packed in one byte heap, string `i` is `heap[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, heap: np.ndarray, offsets: np.ndarray):
+        self.heap = heap
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[Optional[str]]) -> "StringTable":
+        encoded = [(s if isinstance(s, str) else '').encode('utf8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in encoded], out=offsets[1:])
+        heap = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(_readonly(heap.copy()), _readonly(offsets))
+
+    def __getitem__(self, index: int) -> str:
+        return self.heap[self.offsets[index]:self.offsets[index + 1]].tobytes().decode('utf8')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        heap = self.heap.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield heap[start:end].decode('utf8')
+
+
+class KnowsysSnapshot(object):
+    """
+    a read-only, columnar copy of a `KnowsysCollection`.
+
+    items are addressed by dense ids (their position in the collection). once bound to a collection (`bind`),
+    `item` / `get` return the items of that collection. before, knowsys objects are only built when asked for;
+    they are in no collection, their graph queries raise and should be made on the snapshot (`children`,
+    `descendants`, `belongings`, ...).
+    """
+
+    def __init__(self, classes: List[type], columns: Dict[str, np.ndarray],
+                 codes: StringTable, names: StringTable, names_en: StringTable):
+        self.classes = classes
+        self.codes = codes
+        self.names = names
+        self.names_en = names_en
+
+        self.class_id: np.ndarray = columns['class_id']
+        self.parent: np.ndarray = columns['parent']
+        self.belong_to: np.ndarray = columns['belong_to']
+        self.entities: np.ndarray = columns['entities']
+        self.direction: np.ndarray = columns['direction']
+        self.tin: np.ndarray = columns['tin']
+        self.tout: np.ndarray = columns['tout']
+        self.preorder: np.ndarray = columns['preorder']
+        self.child_offsets: np.ndarray = columns['child_offsets']
+        self.child_ids: np.ndarray = columns['child_ids']
+        self.belong_offsets: np.ndarray = columns['belong_offsets']
+        self.belong_ids: np.ndarray = columns['belong_ids']
+        self.sorted_codes: np.ndarray = columns['sorted_codes']
+        self.sorted_code_ids: np.ndarray = columns['sorted_code_ids']
+
+        self._items: Dict[int, "KnowsysAllType"] = {}
+        self.collection: Optional["KnowsysCollection"] = None
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in
+                ['class_id', 'parent', 'belong_to', 'entities', 'direction', 'tin', 'tout', 'preorder',
+                 'child_offsets', 'child_ids', 'belong_offsets', 'belong_ids', 'sorted_codes', 'sorted_code_ids']}
+
+    @classmethod
+    def from_collection(cls, collection: "KnowsysCollection") -> "KnowsysSnapshot":
+        from knowsys.types.relation_type import RelationType
+
+        data = collection.data
+        length = len(data)
+        classes = list(dict.fromkeys(item.__class__ for item in data))
+        class_ids = {t: i for i, t in enumerate(classes)}
+
+        def _id_of(item) -> int:
+            if item is None or isinstance(item, _LazyLoadType):
+                return -1
+            return collection._code2index.get(item.code, -1)
+
+        parent = np.array([_id_of(item.parent) for item in data], dtype=np.int64)
+        belong_to = np.array([_id_of(getattr(item, 'belong_to', None)) for item in data], dtype=np.int64)
+        entities = np.full((length, 2), -1, dtype=np.int64)
+        direction = np.zeros(length, dtype=np.int8)
+        for i, item in enumerate(data):
+            if isinstance(item, RelationType):
+                entities[i] = [_id_of(item.contain_entities[0]), _id_of(item.contain_entities[-1])]
+                direction[i] = item.direction.value
+
+        tin, tout, preorder = collection._hierarchy()
+        child_offsets, child_ids = _csr(parent, length)
+        belong_offsets, belong_ids = _csr(belong_to, length)
+
+        encoded_codes = np.array([item.code.encode('utf8') for item in data], dtype=bytes)
+        sorted_code_ids = np.argsort(encoded_codes, kind='stable')
+
+        columns = {
+            'class_id': np.array([class_ids[item.__class__] for item in data], dtype=np.int16),
+            'parent': parent,
+            'belong_to': belong_to,
+            'entities': entities,
+            'direction': direction,
+            'tin': tin.copy(),
+            'tout': tout.copy(),
+            'preorder': preorder.copy(),
+            'child_offsets': child_offsets,
+            'child_ids': child_ids,
+            'belong_offsets': belong_offsets,
+            'belong_ids': belong_ids,
+            'sorted_codes': encoded_codes[sorted_code_ids],
+            'sorted_code_ids': sorted_code_ids.astype(np.int64),
+        }
+        return cls(classes, {k: _readonly(v) for k, v in columns.items()},
+                   StringTable.from_strings(item.code for item in data),
+                   StringTable.from_strings(item.name for item in data),
+                   StringTable.from_strings(item.name_en for item in data))
+
+    def __len__(self):
+        return len(self.class_id)
+
+    def ids_of(self, codes: Sequence[str]) -> np.ndarray:
+        """
+        vectorized code -> id, -1 for unknown codes.
+        """
+        keys = np.array([code.encode('utf8') for code in codes], dtype=bytes)
+        if len(self.sorted_codes) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.searchsorted(self.sorted_codes, keys)
+        pos = np.minimum(pos, len(self.sorted_codes) - 1)
+        found = self.sorted_codes[pos] == keys
+        return np.where(found, self.sorted_code_ids[pos], -1)
+
+    def id_of(self, code: str) -> int:
+        return int(self.ids_of([code])[0])
+
+    def __contains__(self, code: str):
+        return self.id_of(code) >= 0
+
+    def type_mask(self, knowsys_type_class: type) -> np.ndarray:
+        ids = [i for i, t in enumerate(self.classes) if issubclass(t, knowsys_type_class)]
+        return np.isin(self.class_id, ids)
+
+    def ids_of_type(self, knowsys_type_class: type) -> np.ndarray:
+        return np.flatnonzero(self.type_mask(knowsys_type_class))
+
+    def children_ids(self, index: int) -> np.ndarray:
+        return self.child_ids[self.child_offsets[index]:self.child_offsets[index + 1]]
+
+    def belongings_ids(self, index: int) -> np.ndarray:
+        return self.belong_ids[self.belong_offsets[index]:self.belong_offsets[index + 1]]
+
+    def descendants_ids(self, index: int, include_self=False) -> np.ndarray:
+        if self.tin[index] < 0:
+            return np.zeros(0, dtype=np.int64)
+        start = self.tin[index] if include_self else self.tin[index] + 1
+        return self.preorder[start:self.tout[index]]
+
+    def is_belong_to_ids(self, indexes: np.ndarray, ancestor_indexes: np.ndarray) -> np.ndarray:
+        item_tin = self.tin[indexes]
+        res = (self.tin[ancestor_indexes] < item_tin) & (item_tin < self.tout[ancestor_indexes]) & (item_tin >= 0)
+        return res & (indexes >= 0) & (ancestor_indexes >= 0)
+
+    def bind(self, collection: "KnowsysCollection") -> "KnowsysCollection":
+        """
+        registers the items of the snapshot in `collection`, which must be empty, with the same ids.
+        the hierarchy numbering of the snapshot is reused.
+        """
+        if len(collection) > 0:
+            raise ValueError('a snapshot can only be bound to an empty collection.')
+        codes = list(self.codes)
+
+        def _codes(ids: np.ndarray) -> List[Optional[str]]:
+            return [codes[i] if i >= 0 else None for i in ids.tolist()]
+
+        collection.bulk_add([self.classes[i] for i in self.class_id.tolist()], {
+            'code': codes,
+            'name': list(self.names),
+            'name_en': list(self.names_en),
+            'parent': _codes(self.parent),
+            'belong_to': _codes(self.belong_to),
+            'contain_entities': list(zip(_codes(self.entities[:, 0]), _codes(self.entities[:, 1]))),
+            'direction': [Direction(int(d)) for d in self.direction.tolist()],
+        })
+        # copies, the collection outlives the mapped file
+        collection._tin, collection._tout, collection._preorder = (
+            np.array(self.tin), np.array(self.tout), np.array(self.preorder))
+        self.collection = collection
+        self._items.clear()
+        return collection
+
+    def item(self, index: int) -> Optional["KnowsysAllType"]:
+        if index < 0:
+            return None
+        if self.collection is not None:
+            return self.collection.data[index]
+        res = self._items.get(index)
+        if res is None:
+            res = self._build(index)
+        return res
+
+    def items(self, indexes: Iterable[int]) -> _KnowsysCollection:
+        return _KnowsysCollection([self.item(int(i)) for i in indexes])
+
+    def get(self, code: str, default=None):
+        index = self.id_of(code)
+        return self.item(index) if index >= 0 else default
+
+    find = get
+
+    def children(self, index: int) -> _KnowsysCollection:
+        return self.items(self.children_ids(index))
+
+    def descendants(self, index: int, include_self=False) -> _KnowsysCollection:
+        return self.items(self.descendants_ids(index, include_self))
+
+    def belongings(self, index: int) -> _KnowsysCollection:
+        return self.items(self.belongings_ids(index))
+
+    def _build(self, index: int) -> "KnowsysAllType":
+        from knowsys.types.base import intern_str
+        from knowsys.types.relation_type import RelationType
+
+        t = self.classes[self.class_id[index]]
+        # bypass `__init__`, which registers the item in the global collection
+        res = t.__new__(t)
+        self._items[index] = res
+        res.id = UNBOUND_ID
+        res.code = intern_str(self.codes[index])
+        res.name = intern_str(self.names[index])
+        res.name_en = intern_str(self.names_en[index])
+        _assign(res, 'parent', self.item(int(self.parent[index])))
+        if 'belong_to' in t._mapping:
+            _assign(res, 'belong_to', self.item(int(self.belong_to[index])))
+        if issubclass(t, RelationType):
+            _assign(res, 'contain_entities', (self.item(int(self.entities[index, 0])),
+                                              self.item(int(self.entities[index, 1]))))
+            _assign(res, 'direction', Direction(int(self.direction[index])))
+        return res
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        arrays = dict(self.columns)
+        for name in ['codes', 'names', 'names_en']:
+            table: StringTable = getattr(self, name)
+            arrays[f'{name}_heap'] = table.heap
+            arrays[f'{name}_offsets'] = table.offsets
+        return arrays
+
+    def save(self, path):
+        arrays = self._arrays()
+        header = {'version': _FORMAT_VERSION, 'classes': [t.__name__ for t in self.classes], 'arrays': {}}
+        offset = 0
+        for name, array in arrays.items():
+            header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += _aligned(array.nbytes)
+        header = json.dumps(header).encode('utf8')
+        prefix = _MAGIC + struct.pack('<II', _FORMAT_VERSION, len(header)) + header
+
+        with open(path, 'wb') as f:
+            f.write(prefix + b'\x00' * (_aligned(len(prefix)) - len(prefix)))
+            for array in arrays.values():
+                data = np.ascontiguousarray(array).tobytes()
+                f.write(data + b'\x00' * (_aligned(len(data)) - len(data)))
+
+    @classmethod
+    def load(cls, path) -> "KnowsysSnapshot":
+        """
+        maps a file written by `save`, the columns are read-only views on the mapped file.
+        """
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if buffer[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f'`{path}` is not a knowsys snapshot.')
+        version, header_length = struct.unpack_from('<II', buffer, len(_MAGIC))
+        if version != _FORMAT_VERSION:
+            raise ValueError(f'unsupported knowsys snapshot version {version}, expected {_FORMAT_VERSION}.')
+        header_start = len(_MAGIC) + 8
+        header = json.loads(buffer[header_start:header_start + header_length].decode('utf8'))
+        data_start = _aligned(header_start + header_length)
+
+        arrays = {}
+        for name, meta in header['arrays'].items():
+            dtype = np.dtype(meta['dtype'])
+            count = int(np.prod(meta['shape'], dtype=np.int64))
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + meta['offset'])
+            arrays[name] = array.reshape(meta['shape'])
+
+        class_mapping = {t.__name__: t for t in _knowsys_classes()}
+        tables = {name: StringTable(arrays.pop(f'{name}_heap'), arrays.pop(f'{name}_offsets'))
+                  for name in ['codes', 'names', 'names_en']}
+        return cls([class_mapping[name] for name in header['classes']], arrays, **tables)
+
+    def __repr__(self):
+        counts = np.bincount(self.class_id, minlength=len(self.classes))
+        return (f'KnowsysSnapshot(total:{len(self)}|'
+                f'{ {t.__name__: int(c) for t, c in zip(self.classes, counts)} })')
+
+
+def check_roundtrip(collection: "KnowsysCollection", dir_path) -> List[str]:
+    """
+    saves `collection` with both `KnowsysCollection.save` (csv) and the binary snapshot in `dir_path`,
+    and compares every csv row with the same item rebuilt from the mapped snapshot.
+
+    :return: the mismatches found, empty if both formats hold the same data
+    """
+    def _normalize(value: str) -> str:
+        # missing values are written as `None` / `nan` by the csv path and as empty strings by the snapshot
+        return '' if value in ('None', 'nan') else value
+
+    collection.save(dir_path)
+    snapshot_path = os.path.join(dir_path, 'knowsys.snapshot')
+    collection.save_snapshot(snapshot_path)
+    snapshot = KnowsysSnapshot.load(snapshot_path)
+
+    errors = []
+    if len(snapshot) != len(collection):
+        errors.append(f'length: csv {len(collection)} != snapshot {len(snapshot)}')
+    for t in snapshot.classes:
+        with open(os.path.join(dir_path, f'{t.__name__}.csv'), 'r', encoding='utf8', newline='') as f:
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                item = snapshot.get(row[0])
+                if item is None:
+                    errors.append(f'{t.__name__} {row[0]}: missing in snapshot')
+                    continue
+                expected = [_normalize(value) for value in row]
+                got = [_normalize(str(value)) for value in item.saving_list()]
+                if expected != got:
+                    errors.append(f'{t.__name__} {row[0]}: csv {expected} != snapshot {got}')
+    return errors
+
+
+if __name__ == '__main__':
+    import sys
+    import tempfile
+
+    import knowsys
+
+    collection = knowsys.load_knowsys(source='files')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mismatches = check_roundtrip(collection, tmp_dir)
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f'{len(mismatches)} mismatches.')
+    sys.exit(1 if mismatches else 0)
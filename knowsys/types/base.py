@@ -1,9 +1,12 @@
 import logging
+import operator
+import sys
 
 from dataclasses import dataclass
-from knowsys.collection import knowsys_collection, _KnowsysCollection, _LazyLoadType
+from knowsys.collection import knowsys_collection, _KnowsysCollection, _LazyLoadType, memoized
 from typing import *
 
+from knowsys.code import Code
 from knowsys.enums import Direction
 from knowsys.utils.strings import random_string
 
@@ -19,9 +22,33 @@ class _DirectionData(str):
     pass
 
 
+def intern_str(value):
+    # names repeat a lot across terms, one shared string per value
+    return sys.intern(str(value)) if isinstance(value, str) else value
+
+
+def _reference(attr: str) -> property:
+    """
+    an attribute holding other items, stored in the slot `_<attr>`. assigning it on an item of a collection
+    updates the indexes of the collection, see `KnowsysCollection.relink`.
+    """
+    slot = '_' + attr
+
+    def setter(self, value):
+        old = getattr(self, slot, None)
+        setattr(self, slot, value)
+        self.collection.relink(self, attr, old)
+
+    return property(operator.attrgetter(slot), setter)
+
+
 class KnowsysType(object):
+    # no per-item `__dict__`, results derived from an item are cached by its collection (see `memoized`).
+    # `id` is the dense id given by the collection when the item is added, its position in the collection.
+    __slots__ = ('code', 'name', 'name_en', '_parent', 'id')
 
     collection = knowsys_collection
+    parent = _reference('parent')
     _mapping = [_DirectData('code'), _DirectData('name'), _DirectData('name_en'), _MappingData('parent')]
 
     def saving_list(self) -> List[str]:
@@ -52,7 +79,7 @@ class KnowsysType(object):
             if isinstance(key, _DirectData):
                 inputs[key] = value
             elif isinstance(key, _MappingData):
-                inputs[key] = _LazyLoadType(value, None)
+                inputs[key] = _LazyLoadType(value, None) if value else None
             elif isinstance(key, _DirectionData):
                 inputs[key] = getattr(Direction, value)
             else:
@@ -65,9 +92,9 @@ class KnowsysType(object):
                  name_en: Optional[str] = None,
                  parent: Optional["KnowsysType"] = None):
 
-        self.code: str = code
-        self.name: str = name
-        self.name_en: Optional[str] = name_en
+        self.code: str = intern_str(code)
+        self.name: str = intern_str(name)
+        self.name_en: Optional[str] = intern_str(name_en)
         self.parent: Optional["KnowsysType"] = parent
 
         if self.code in self.collection:
@@ -76,35 +103,24 @@ class KnowsysType(object):
         else:
             self.collection.add(self)
 
-    def create_child(self, name, code=None, name_en=None):
+    def create_child(self, name, code=None, name_en=None, **kwargs):
         if code is None:
             code = random_string(64)
-        return self.__class__(name, code, name_en, self)
+        return self.__class__(code, name, name_en, self, **kwargs)
 
     @property
     def Code(self):
-        from knowsys.code import Code
         return Code.of(self.code)
 
     def is_belong_to(self, other):
-        tmp = self.parent
-        while tmp is not None:
-            if tmp == other:
-                return True
-            tmp = tmp.parent
-        return False
+        return self.collection.is_belong_to(self, other)
 
     def contains(self, refresh=True):
-        if refresh:
-            setattr(self, '_contains',
-                    self.collection.filter(lambda item: item.parent == self))
-        return getattr(self, '_contains', None)
+        return self.collection.memoize('contains', self, lambda: self.collection.children_of(self), refresh)
 
+    @memoized
     def flatten(self) -> _KnowsysCollection:
-        res = [self]
-        for child in self.contains():
-            res.extend(child.flatten())
-        return _KnowsysCollection(res)
+        return self.collection.descendants_of(self, include_self=True)
 
     def __getitem__(self, item):
         return self.contains()[item]
@@ -2,10 +2,12 @@ from typing import *
 from dataclasses import dataclass
 
 from knowsys.types.base import KnowsysType, _DirectData, _MappingData
-from knowsys.collection import KnowsysCollection, _KnowsysCollection
+from knowsys.collection import _KnowsysCollection, _LazyLoadType, memoized
 
 
 class EntityType(KnowsysType):
+    __slots__ = ()
+
     code: str
     name: str
     name_en: Optional[str]
@@ -21,50 +23,40 @@ class EntityType(KnowsysType):
                  parent: Optional["KnowsysType"] = None):
         super().__init__(code, name, name_en, parent)
 
-    def relations_start_by(self, refresh=True):
-        from knowsys.types.relation_type import RelationType
-        if refresh:
-            setattr(self, '_relations_start_from',
-                    list(filter(lambda item: isinstance(item, RelationType) and item.from_entity == self,
-                                KnowsysCollection.instance.data)))
-        return getattr(self, '_relations_start_from', None)
+    def relations_start_by(self, refresh=True, with_parents=False):
+        res = self.collection.memoize(f'relations_start_by:{with_parents}', self,
+                                      lambda: self.collection.relations_of(self, 'from', with_parents), refresh)
+        return None if res is None else res.list()
 
-    def relations_end_by(self, refresh=True):
-        from knowsys.types.relation_type import RelationType
-        if refresh:
-            setattr(self, '_relations_end_by',
-                    list(filter(lambda item: isinstance(item, RelationType) and item.to_entity == self,
-                                KnowsysCollection.instance.data)))
-        return getattr(self, '_relations_end_by', None)
+    def relations_end_by(self, refresh=True, with_parents=False):
+        res = self.collection.memoize(f'relations_end_by:{with_parents}', self,
+                                      lambda: self.collection.relations_of(self, 'to', with_parents), refresh)
+        return None if res is None else res.list()
 
     def properties(self, refresh=True) -> _KnowsysCollection:
         from knowsys.types.property_type import PropertyType
-        if refresh:
-            setattr(self, '_properties',
-                    self.collection.filter(lambda item: isinstance(item, PropertyType) and item.belong_to == self)),
-        return getattr(self, '_properties', None)
-
-    def properties_with_parents(self, refresh=True) -> _KnowsysCollection:
-        if refresh:
-            p = self.properties()
-            tmp = self.parent
-            while tmp is not None:
-                for pp in tmp.properties():
-                    if not p.contain_with_parent(pp):
-                        p._add(pp)
-                tmp = tmp.parent
-            setattr(self, '_property_with_parents', p)
-        return getattr(self, '_property_with_parents', None)
+        return self.collection.memoize('properties', self,
+                                       lambda: self.collection.belongings_of(self, PropertyType), refresh)
+
+    @memoized
+    def properties_with_parents(self) -> _KnowsysCollection:
+        res = _KnowsysCollection(self.properties().list())
+        tmp = self.parent
+        while tmp is not None and not isinstance(tmp, _LazyLoadType):
+            for pp in tmp.properties():
+                if not res.contain_with_parent(pp):
+                    res._add(pp)
+            tmp = tmp.parent
+        return res
 
     def terms(self, refresh=True):
         from knowsys.types.term_type import EntityTermType
-        if refresh:
-            setattr(self, '_terms',
-                    self.collection.filter(lambda item: isinstance(item, EntityTermType) and item.parent is None and item.belong_to == self))
-        return getattr(self, '_terms', None)
+        return self.collection.memoize(
+            'terms', self, lambda: self.collection.belongings_of(self, EntityTermType, roots_only=True), refresh)
 
+    @memoized
     def terms_with_children(self):
-        res = self.terms()
+        res = self.terms().list()
         for item in self.contains():
             res.extend(item.terms_with_children())
-        return res
+        return _KnowsysCollection(res)
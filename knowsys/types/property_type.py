@@ -2,8 +2,8 @@ import typing
 from typing import *
 from dataclasses import dataclass
 
-from knowsys.types.base import KnowsysType, _DirectData, _MappingData
-from knowsys.collection import KnowsysCollection
+from knowsys.types.base import KnowsysType, _DirectData, _MappingData, _reference
+from knowsys.collection import KnowsysCollection, _KnowsysCollection, memoized
 
 if typing.TYPE_CHECKING:
     from knowsys.types.entity_type import EntityType
@@ -11,6 +11,8 @@ if typing.TYPE_CHECKING:
 
 
 class PropertyType(KnowsysType):
+    __slots__ = ('_belong_to',)
+
     code: str
     name: str
     name_en: Optional[str]
@@ -21,36 +23,38 @@ class PropertyType(KnowsysType):
     _mapping = [_DirectData('code'), _DirectData('name'), _DirectData('name_en'),
                 _MappingData('parent'), _MappingData('belong_to')]
 
+    belong_to = _reference('belong_to')
+
     def __init__(self,
                  code: str,
                  name: str,
                  name_en: Optional[str] = None,
                  parent: Optional["PropertyType"] = None,
                  belong_to: Optional["KnowsysType"] = None):
-        super().__init__(code, name, name_en, parent)
-
+        # set before registering, the collection indexes items by `belong_to`
         self.belong_to = belong_to
 
+        super().__init__(code, name, name_en, parent)
+
     def create_child(self, name, code=None, name_en=None):
-        res = super().create_child(name, code, name_en)
-        res.belong_to = self.belong_to
-        return res
+        return super().create_child(name, code, name_en, belong_to=self.belong_to)
 
     def terms(self, refresh=True):
         from knowsys.types.term_type import PropertyTermType
-        if refresh:
-            setattr(self, '_terms',
-                    self.collection.filter(lambda item: isinstance(item, PropertyTermType) and item.parent is None and item.belong_to == self))
-        return getattr(self, '_terms', None)
+        return self.collection.memoize(
+            'terms', self, lambda: self.collection.belongings_of(self, PropertyTermType, roots_only=True), refresh)
 
+    @memoized
     def terms_with_children(self):
-        res = self.terms()
+        res = self.terms().list()
         for item in self.contains():
             res.extend(item.terms_with_children())
-        return res
+        return _KnowsysCollection(res)
 
 
 class EntityPropertyType(PropertyType):
+    __slots__ = ()
+
     code: str
     name: str
     name_en: Optional[str]
@@ -60,6 +64,8 @@ class EntityPropertyType(PropertyType):
 
 
 class RelationPropertyType(PropertyType):
+    __slots__ = ()
+
     code: str
     name: str
     name_en: Optional[str]
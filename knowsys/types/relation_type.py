@@ -2,8 +2,8 @@ from typing import *
 from dataclasses import dataclass
 
 from knowsys.enums import Direction
-from knowsys.types.base import KnowsysType, _DirectData, _MappingData, _DirectionData
-from knowsys.collection import _KnowsysCollection, _LazyLoadType
+from knowsys.types.base import KnowsysType, _DirectData, _MappingData, _DirectionData, _reference
+from knowsys.collection import _KnowsysCollection, _LazyLoadType, memoized
 from knowsys.types.property_type import PropertyType
 
 if TYPE_CHECKING:
@@ -15,6 +15,8 @@ class _TupleData(str):
 
 
 class RelationType(KnowsysType):
+    __slots__ = ('_contain_entities', '_direction')
+
     code: str
     name: str
     name_en: Optional[str]
@@ -27,6 +29,10 @@ class RelationType(KnowsysType):
     _mapping = [_DirectData('code'), _DirectData('name'), _DirectData('name_en'),
                 _MappingData('parent'), _TupleData('contain_entities'), _DirectionData('direction')]
 
+    # the endpoints indexed by the collection depend on both
+    contain_entities = _reference('contain_entities')
+    direction = _reference('direction')
+
     def saving_list(self) -> List[str]:
         res = []
         for item in self._mapping:
@@ -41,7 +47,7 @@ class RelationType(KnowsysType):
             elif isinstance(item, _DirectionData):
                 res.append(getattr(self, item).name)
             elif isinstance(item, _TupleData):
-                res.append('|'.join([i.code for i in getattr(self, item)]))
+                res.append('|'.join(['' if i is None else i.code for i in getattr(self, item)]))
             else:
                 raise TypeError(f'Unexpected type {type(item)}')
         return res
@@ -53,7 +59,7 @@ class RelationType(KnowsysType):
             if isinstance(key, _DirectData):
                 inputs[key] = value
             elif isinstance(key, _MappingData):
-                inputs[key] = _LazyLoadType(value, None)
+                inputs[key] = _LazyLoadType(value, None) if value else None
             elif isinstance(key, _DirectionData):
                 inputs[key] = getattr(Direction, value)
             elif isinstance(key, _TupleData):
@@ -68,9 +74,10 @@ class RelationType(KnowsysType):
                  parent: Optional["KnowsysType"] = None,
                  contain_entities: Tuple["EntityType", "EntityType"] = (None, None),
                  direction: Direction = Direction.UNKNOWN):
-        super().__init__(code, name, name_en, parent)
+        # set before registering, the collection indexes relations by their endpoints
         self.contain_entities = contain_entities
         self.direction = direction
+        super().__init__(code, name, name_en, parent)
 
     def create_child(self, name, code=None, name_en=None,
                      contain_entities: Tuple["EntityType", "EntityType"] = None,
@@ -80,10 +87,8 @@ class RelationType(KnowsysType):
         if direction is None:
             direction = self.direction
 
-        res = super().create_child(name, code, name_en)
-        res.contain_entities = contain_entities
-        res.direction = direction
-        return res
+        return super().create_child(name, code, name_en,
+                                    contain_entities=contain_entities, direction=direction)
 
     @property
     def from_entity(self):
@@ -102,32 +107,28 @@ class RelationType(KnowsysType):
         return None
 
     def properties(self, refresh=True):
-        if refresh:
-            setattr(self, '_properties',
-                    self.collection.filter(lambda item: isinstance(item, PropertyType) and item.belong_to == self))
-        return getattr(self, '_properties', None)
-
-    def properties_with_parents(self, refresh=True) -> "_KnowsysCollection":
-        if refresh:
-            p = self.properties()
-            tmp = self.parent
-            while tmp is not None:
-                for pp in tmp.properties():
-                    if not p.contain_with_parent(pp):
-                        p._add(pp)
-                tmp = tmp.parent
-            setattr(self, '_property_with_parents', p)
-        return getattr(self, '_property_with_parents', None)
+        return self.collection.memoize('properties', self,
+                                       lambda: self.collection.belongings_of(self, PropertyType), refresh)
+
+    @memoized
+    def properties_with_parents(self) -> "_KnowsysCollection":
+        res = _KnowsysCollection(self.properties().list())
+        tmp = self.parent
+        while tmp is not None and not isinstance(tmp, _LazyLoadType):
+            for pp in tmp.properties():
+                if not res.contain_with_parent(pp):
+                    res._add(pp)
+            tmp = tmp.parent
+        return res
 
     def terms(self, refresh=True):
         from knowsys.types.term_type import RelationTermType
-        if refresh:
-            setattr(self, '_terms',
-                    self.collection.filter(lambda item: isinstance(item, RelationTermType) and item.parent is None and item.belong_to == self))
-        return getattr(self, '_terms', None)
+        return self.collection.memoize(
+            'terms', self, lambda: self.collection.belongings_of(self, RelationTermType, roots_only=True), refresh)
 
+    @memoized
     def terms_with_children(self):
-        res = self.terms()
+        res = self.terms().list()
         for item in self.contains():
             res.extend(item.terms_with_children())
-        return res
+        return _KnowsysCollection(res)
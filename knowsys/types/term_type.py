@@ -2,7 +2,7 @@ import typing
 from typing import *
 from dataclasses import dataclass
 
-from knowsys.types.base import KnowsysType, _DirectData, _MappingData
+from knowsys.types.base import KnowsysType, _DirectData, _MappingData, _reference
 from knowsys.collection import KnowsysCollection
 
 if typing.TYPE_CHECKING:
@@ -11,6 +11,8 @@ if typing.TYPE_CHECKING:
 
 
 class TermType(KnowsysType):
+    __slots__ = ('_belong_to',)
+
     code: str
     name: str
     name_en: Optional[str]
@@ -21,23 +23,26 @@ class TermType(KnowsysType):
     _mapping = [_DirectData('code'), _DirectData('name'), _DirectData('name_en'),
                 _MappingData('parent'), _MappingData('belong_to')]
 
+    belong_to = _reference('belong_to')
+
     def __init__(self,
                  code: str,
                  name: str,
                  name_en: Optional[str] = None,
                  parent: Optional["TermType"] = None,
                  belong_to: Optional["KnowsysType"] = None):
-        super().__init__(code, name, name_en, parent)
-
+        # set before registering, the collection indexes items by `belong_to`
         self.belong_to = belong_to
 
+        super().__init__(code, name, name_en, parent)
+
     def create_child(self, name, code=None, name_en=None):
-        res = super().create_child(name, code, name_en)
-        res.belong_to = self.belong_to
-        return res
+        return super().create_child(name, code, name_en, belong_to=self.belong_to)
 
 
 class EntityTermType(TermType):
+    __slots__ = ()
+
     code: str
     name: str
     name_en: Optional[str]
@@ -55,6 +60,8 @@ class EntityTermType(TermType):
 
 
 class RelationTermType(TermType):
+    __slots__ = ()
+
     code: str
     name: str
     name_en: Optional[str]
@@ -72,6 +79,8 @@ class RelationTermType(TermType):
 
 
 class PropertyTermType(TermType):
+    __slots__ = ()
+
     code: str
     name: str
     name_en: Optional[str]
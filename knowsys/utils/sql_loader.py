@@ -1,67 +1,461 @@
+import atexit
+import contextlib
+import hashlib
+import logging
+import operator
 import os
+import pickle
+import re
+import sys
+import threading
+import time
 
-import MySQLdb
+import numpy as np
 import pandas as pd
-from sshtunnel import SSHTunnelForwarder
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from typing import *
+from knowsys.global_config import configs
 
 
 SQL_ENV = os.environ.get('LOAD_FROM_SQL', 'knowsys-pre')
 
 
-def load_table_from_sql_vanilla(db_name: str, sql: str):
+def mysql_connect(db_name: str):
+    import MySQLdb
+
     # with SSHTunnelForwarder(
     #         (ssh_host, ssh_port),  # B机器的配置--跳板机
     #         ssh_password=ssh_passwd,  # B机器的配置--跳板机账号
     #         ssh_username=ssh_username,  # B机器的配置--跳板机账户密码
     #         remote_bind_address=(mysql_host, mysql_port)) as server:  # A机器的配置-MySQL服务器
 
-    conn = MySQLdb.connect(host=mysql_host,  # 此处必须是必须是127.0.0.1，代表C机器
-                           port=mysql_port,
-                           user=mysql_username,  # A机器的配置-MySQL服务器账户
-                           passwd=mysql_passwd,  # A机器的配置-MySQL服务器密码c
+    return MySQLdb.connect(host=configs['KNOWSYS_MYSQL_HOST'],  # 此处必须是必须是127.0.0.1，代表C机器
+                           port=configs['KNOWSYS_MYSQL_PORT'],
+                           user=configs['KNOWSYS_MYSQL_USER'],  # A机器的配置-MySQL服务器账户
+                           passwd=configs['KNOWSYS_MYSQL_PASSWD'],  # A机器的配置-MySQL服务器密码c
                            db=db_name,  # 可以限定，只访问特定的数据库,否则需要在mysql的查询或者操作语句中，指定好表名
                            charset='utf8'  # 和数据库字符编码集合，保持一致，这样能够解决读出数据的中文乱码问题
                            )
-    data = pd.read_sql(sql, conn)
-    return data
 
 
-def load_tables_from_sql(db_name: str, table_names: List[str]) -> List[pd.DataFrame]:
-    # with SSHTunnelForwarder(
-    #         (ssh_host, ssh_port),  # B机器的配置--跳板机
-    #         ssh_password=ssh_passwd,  # B机器的配置--跳板机账号
-    #         ssh_username=ssh_username,  # B机器的配置--跳板机账户密码
-    #         remote_bind_address=(mysql_host, mysql_port)) as server:  # A机器的配置-MySQL服务器
+def mysql_stream_cursor(conn):
+    import MySQLdb.cursors
 
-    conn = MySQLdb.connect(host=mysql_host,  # 此处必须是必须是127.0.0.1，代表C机器
-                           port=mysql_port,
-                           user=mysql_username,  # A机器的配置-MySQL服务器账户
-                           passwd=mysql_passwd,  # A机器的配置-MySQL服务器密码c
-                           db=db_name,  # 可以限定，只访问特定的数据库,否则需要在mysql的查询或者操作语句中，指定好表名
-                           charset='utf8'  # 和数据库字符编码集合，保持一致，这样能够解决读出数据的中文乱码问题
-                           )
-    res = []
-    for name in table_names:
-        data = pd.read_sql(f'select * from {name}', conn)
-        res.append(data)
+    # unbuffered, the rows stay on the server until they are fetched
+    return conn.cursor(MySQLdb.cursors.SSCursor)
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda column, values: column.isin(values),
+}
+
+_PLACEHOLDERS = {'format': '%s', 'pyformat': '%s', 'qmark': '?'}
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """
+    the columns and rows of a table the loader uses, compiled to a parameterized select.
+
+    :param columns: the selected columns, all of them if empty
+    :param where: (column, operator, value) predicates joined by `and`, `in` takes a tuple of values
+    :param converters: of `pd.read_excel` when the cached table is read
+    :param key: the primary key, with `updated` the table is synced incrementally by `sync_table`
+    :param updated: the last modification time of a row
+    """
+    name: str
+    columns: Tuple[str, ...] = ()
+    where: Tuple[Tuple[str, str, Any], ...] = ()
+    converters: Dict[str, Callable] = field(default_factory=dict, compare=False)
+    key: Optional[str] = None
+    updated: Optional[str] = None
+
+    def __post_init__(self):
+        names = (self.name, *self.columns, *(column for column, _, _ in self.where),
+                 *(name for name in (self.key, self.updated) if name is not None))
+        for name in names:
+            if not _IDENTIFIER.match(name):
+                raise ValueError(f'`{name}` is not a valid sql identifier.')
+        for column, op, value in self.where:
+            if op not in _OPERATORS:
+                raise ValueError(f'unknown operator `{op}` on `{column}`, expected one of {list(_OPERATORS)}.')
+
+    @classmethod
+    def of(cls, table: Union[str, "TableSpec"]) -> "TableSpec":
+        return table if isinstance(table, TableSpec) else cls(table)
+
+    @property
+    def cache_name(self) -> str:
+        # the whole table keeps the plain name, so the caches dumped before the specs are still used
+        if not self.columns and not self.where:
+            return self.name
+        key = repr((self.columns, self.where)).encode('utf8')
+        return f'{self.name}.{hashlib.sha1(key).hexdigest()[:12]}'
+
+    def select(self, paramstyle: str = 'format') -> Tuple[str, List[Any]]:
+        mark = _PLACEHOLDERS[paramstyle]
+        clauses, params = [], []
+        for column, op, value in self.where:
+            if op == 'in':
+                clauses.append(f'{column} in ({", ".join([mark] * len(value))})')
+                params.extend(value)
+            else:
+                clauses.append(f'{column} {op} {mark}')
+                params.append(value)
+        params = [_sql_value(param) for param in params]
+        sql = f'select {", ".join(self.columns) or "*"} from {self.name}'
+        if clauses:
+            sql += ' where ' + ' and '.join(clauses)
+        return sql, params
+
+    @property
+    def stored_columns(self) -> Tuple[str, ...]:
+        # the columns of the sync cache, the selected ones and what the next delta sync needs
+        if not self.columns:
+            return ()
+        extra = (name for name in (self.key, self.updated) if name is not None and name not in self.columns)
+        return (*self.columns, *extra)
 
+    def filter(self, data: pd.DataFrame) -> pd.DataFrame:
+        for column, op, value in self.where:
+            data = data[_OPERATORS[op](data[column], value)]
+        return data
+
+    def apply(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        the same selection on a DataFrame of the whole table.
+        """
+        data = self.filter(data)
+        if self.columns:
+            data = data[list(self.columns)]
+        return data
+
+
+def _concat_chunks(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    `pd.concat` of the chunks of a table, taken as they arrive. each chunk is split in columns and released,
+    the columns are concatenated one at a time at the end, so the table is held once plus one column instead of
+    once as the list of chunks and once as the result.
+    """
+    columns, parts = None, None
+    for chunk in chunks:
+        if parts is None:
+            columns = chunk.columns
+            parts = [[] for _ in columns]
+        # copies, a view would keep the block of the whole chunk alive
+        for i, part in enumerate(parts):
+            part.append(chunk.iloc[:, i].copy())
+        del chunk
+    if parts is None:
+        raise ValueError('no chunk to concatenate.')
+    data = {}
+    for i, part in enumerate(parts):
+        data[i] = pd.concat(part, ignore_index=True)
+        part.clear()
+    res = pd.DataFrame(data, copy=False)
+    res.columns = columns
     return res
 
 
+def _sql_value(value):
+    # numpy and pandas scalars are not accepted by every driver
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class ConnectionPool(object):
+    """
+    keeps up to `max_size` db-api connections open and hands them out one thread at a time.
+
+    :param connect: creates a new connection, e.g. `lambda: sqlite3.connect(path, check_same_thread=False)`
+    :param health_check: run on an idle connection before it is handed out again, broken ones are replaced
+    :param stream_cursor: opens a cursor fetching the rows from the server as they are asked for,
+                          a plain `conn.cursor()` by default
+    :param paramstyle: the db-api paramstyle of the driver, `format` for MySQLdb, `qmark` for sqlite3
+    """
+
+    def __init__(self, connect: Callable[[], Any], max_size: int = configs['KNOWSYS_SQL_POOL_SIZE'],
+                 health_check: str = 'select 1', stream_cursor: Optional[Callable[[Any], Any]] = None,
+                 paramstyle: str = 'format'):
+        if paramstyle not in _PLACEHOLDERS:
+            raise ValueError(f'unsupported paramstyle `{paramstyle}`.')
+        if max_size < 1:
+            raise ValueError('a connection pool needs at least one connection.')
+        self.max_size = max_size
+        self.health_check = health_check
+        self.stream_cursor = stream_cursor or (lambda conn: conn.cursor())
+        self.paramstyle = paramstyle
+        self._connect = connect
+        self._idle: List[Any] = []
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logging.debug(f'[sql]: closing a connection failed: {e}')
+
+    def _healthy(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.health_check)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logging.warning(f'[sql]: dropping a broken connection: {e}')
+            return False
+
+    def acquire(self):
+        """
+        waits for a free slot and returns a healthy connection, `release` gives it back.
+        """
+        if self._closed:
+            raise RuntimeError('the connection pool is closed.')
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    return self._connect()
+                if self._healthy(conn):
+                    return conn
+                self._close(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken: bool = False):
+        with self._lock:
+            keep = not broken and not self._closed
+            if keep:
+                self._idle.append(conn)
+        if not keep:
+            self._close(conn)
+        self._slots.release()
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, broken=not self._healthy(conn))
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        """
+        closes the idle connections, the ones in use are closed when they are released.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name: str) -> ConnectionPool:
+    """
+    the shared pool of mysql connections to `db_name`, closed by `close_pools` or at exit.
+    """
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None or pool._closed:
+            pool = _pools[db_name] = ConnectionPool(lambda: mysql_connect(db_name), stream_cursor=mysql_stream_cursor)
+        return pool
+
+
+@atexit.register
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class SqlSession(object):
+    """
+    reads several tables of one database. sequential reads share the connection of the session,
+    with `max_workers` > 1 independent tables are read concurrently on connections of the pool.
+
+    :param db_name: uses the shared mysql pool of this database
+    :param pool: uses this pool instead, e.g. one of sqlite connections
+    """
+
+    def __init__(self, db_name: Optional[str] = None, pool: Optional[ConnectionPool] = None,
+                 max_workers: Optional[int] = None):
+        if pool is None:
+            if db_name is None:
+                raise ValueError('a session needs a `db_name` or a `pool`.')
+            pool = get_pool(db_name)
+        self.pool = pool
+        self.max_workers = pool.max_size if max_workers is None else max_workers
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self.pool.acquire()
+        return self._conn
+
+    def read_sql(self, sql: str, params=None) -> pd.DataFrame:
+        return pd.read_sql(sql, self._connection(), params=params)
+
+    def _iter_sql(self, conn, sql: str, params, chunk_size: int) -> Iterator[pd.DataFrame]:
+        cursor = self.pool.stream_cursor(conn)
+        try:
+            if params is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(sql, params)
+            columns = [d[0] for d in cursor.description]
+            empty = True
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                empty = False
+                yield pd.DataFrame.from_records(rows, columns=columns)
+            if empty:
+                yield pd.DataFrame(columns=columns)
+        finally:
+            cursor.close()
+
+    def iter_sql(self, sql: str, params=None,
+                 chunk_size: int = configs['KNOWSYS_SQL_CHUNK_SIZE']) -> Iterator[pd.DataFrame]:
+        """
+        reads the result of `sql` as DataFrames of at most `chunk_size` rows, fetched one chunk at a time
+        on the stream cursor of the pool. an empty result gives one empty DataFrame with the columns.
+        """
+        return self._iter_sql(self._connection(), sql, params, chunk_size)
+
+    def iter_table(self, table: Union[str, TableSpec],
+                   chunk_size: int = configs['KNOWSYS_SQL_CHUNK_SIZE']) -> Iterator[pd.DataFrame]:
+        """
+        `iter_sql` over the columns and rows of the table spec, the rows/s and the peak rss are logged
+        once it is read.
+        """
+        spec = TableSpec.of(table)
+        sql, params = spec.select(self.pool.paramstyle)
+        yield from self._timed(spec.name, self.iter_sql(sql, params or None, chunk_size))
+
+    @staticmethod
+    def _timed(table_name: str, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        start, rows = time.perf_counter(), 0
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+            del chunk
+        seconds = time.perf_counter() - start
+        logging.info(f'[sql]: {table_name}: {rows} rows in {seconds:.3f}s ({rows / max(seconds, 1e-9):.0f} rows/s), '
+                     f'peak rss {_peak_rss_mb():.1f}MB')
+
+    def _read_pooled(self, table: Union[str, TableSpec]) -> pd.DataFrame:
+        spec = TableSpec.of(table)
+        sql, params = spec.select(self.pool.paramstyle)
+        with self.pool.connection() as conn:
+            chunks = self._iter_sql(conn, sql, params or None, configs['KNOWSYS_SQL_CHUNK_SIZE'])
+            return _concat_chunks(self._timed(spec.name, chunks))
+
+    def load_tables(self, tables: List[Union[str, TableSpec]]) -> List[pd.DataFrame]:
+        workers = min(self.max_workers, self.pool.max_size, len(tables))
+        if workers <= 1:
+            return [_concat_chunks(self.iter_table(table)) for table in tables]
+        # the connection of the session would hold a slot of the pool the workers wait for
+        self.release()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self._read_pooled, tables))
+
+    def release(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self.pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def load_table_from_sql_vanilla(db_name: str, sql: str):
+    with SqlSession(db_name) as session:
+        return session.read_sql(sql)
+
+
+def load_tables_from_sql(db_name: str, tables: List[Union[str, TableSpec]]) -> List[pd.DataFrame]:
+    with SqlSession(db_name) as session:
+        return session.load_tables(tables)
+
+
 def load_table_from_sql(db_name: str, table_name: str) -> pd.DataFrame:
     return load_tables_from_sql(db_name, [table_name])[0]
 
 
-def save_tables_from_sql(to_dir: str, db_name: str, table_names: List[str]):
-    tables: List[pd.DataFrame] = load_tables_from_sql(db_name, table_names)
+def _write_excel(path: str, chunks: Iterable[pd.DataFrame]):
+    # same layout as `DataFrame.to_excel`, but the rows are streamed to the file one chunk at a time
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    index = 0
+    for chunk in chunks:
+        if index == 0:
+            sheet.append([None, *chunk.columns])
+        for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append([index, *row])
+            index += 1
+    workbook.save(path)
 
+
+def save_tables_from_sql(to_dir: str, db_name: str, tables: List[Union[str, TableSpec]]):
     if not os.path.exists(to_dir):
         os.makedirs(to_dir)
 
-    for name, table in zip(table_names, tables):
-        table.to_excel(os.path.join(to_dir, name + '.xlsx'))
+    with SqlSession(db_name) as session:
+        for table in tables:
+            spec = TableSpec.of(table)
+            _write_excel(os.path.join(to_dir, spec.cache_name + '.xlsx'), session.iter_table(spec))
 
 
 def auto_load_table_from_sql(cached_dir, db_name, table_name, force_update=False,
@@ -80,6 +474,144 @@ def auto_load_table_from_sql(cached_dir, db_name, table_name, force_update=False
     return pd.read_excel(excel_data_path, **kwargs)
 
 
+_SYNC_CACHE_VERSION = 1
+
+
+def _read_sync_cache(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'rb') as f:
+            cache = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f'[sql]: ignoring the unreadable sync cache `{path}`: {e}')
+        return None
+    return cache if isinstance(cache, dict) and cache.get('version') == _SYNC_CACHE_VERSION else None
+
+
+def _read_all(session: SqlSession, spec: TableSpec) -> pd.DataFrame:
+    return _concat_chunks(session.iter_table(spec))
+
+
+def _high_water_mark(session: SqlSession, spec: TableSpec):
+    # of the whole table, rows outside the predicates may enter them later
+    return list(session.iter_sql(f'select max({spec.updated}) from {spec.name}'))[0].iloc[0, 0]
+
+
+def _sorted(data: pd.DataFrame, spec: TableSpec) -> pd.DataFrame:
+    if spec.key is not None:
+        data = data.sort_values(spec.key, kind='stable')
+    return data.reset_index(drop=True)
+
+
+# keys per `in (...)` query of a delta sync
+_IN_BATCH = 1000
+
+
+def _delta_sync(session: SqlSession, spec: TableSpec, cache: Dict[str, Any]) -> Tuple[pd.DataFrame, Any, int]:
+    data: pd.DataFrame = cache['data']
+    high_water_mark = _high_water_mark(session, spec)
+    stored = spec.stored_columns
+    # the predicates are applied after the merge, so that rows leaving them are seen as changed
+    columns = stored + tuple(column for column, _, _ in spec.where if stored and column not in stored)
+    changed = _read_all(session, TableSpec(spec.name, columns, ((spec.updated, '>=', cache['high_water_mark']),)))
+    alive = _read_all(session, TableSpec(spec.name, (spec.key,), spec.where))[spec.key]
+
+    # alive rows the high-water mark cannot see, e.g. inserted with a null `updated`
+    missing = alive[~alive.isin(data[spec.key]) & ~alive.isin(changed[spec.key])].tolist()
+    if missing:
+        changed = pd.concat([changed] + [
+            _read_all(session, TableSpec(spec.name, columns, ((spec.key, 'in', tuple(missing[i:i + _IN_BATCH])),)))
+            for i in range(0, len(missing), _IN_BATCH)], ignore_index=True)
+
+    kept = spec.filter(changed)
+    if stored:
+        kept = kept[list(stored)]
+    data = pd.concat([data[~data[spec.key].isin(changed[spec.key])], kept], ignore_index=True)
+    data = _sorted(data[data[spec.key].isin(alive)], spec)
+    return data, high_water_mark, len(changed) + len(alive)
+
+
+def sync_table(session: SqlSession, spec: TableSpec, cache_path: str,
+               full: bool = False) -> Tuple[pd.DataFrame, int]:
+    """
+    brings the pickled cache of a table up to date and returns the table with the number of rows transferred.
+    with `spec.key` and `spec.updated` only the rows modified since the last sync (its high-water mark) and the keys
+    of the rows still alive are read, otherwise, or when the cache is missing or the delta fails, the whole table.
+
+    :param full: read the whole table again
+    """
+    cache = None if full else _read_sync_cache(cache_path)
+    incremental = spec.key is not None and spec.updated is not None
+    start = time.perf_counter()
+
+    data = None
+    if incremental and cache is not None and cache['high_water_mark'] is not None:
+        try:
+            data, high_water_mark, transferred = _delta_sync(session, spec, cache)
+            mode = 'delta'
+        except Exception as e:
+            logging.warning(f'[sql]: delta sync of {spec.name} failed, reading the whole table: {e}')
+            session.release()
+    if data is None:
+        # read before the rows, a row modified meanwhile is read again by the next delta
+        high_water_mark = _high_water_mark(session, spec) if incremental else None
+        data = _sorted(_read_all(session, replace(spec, columns=spec.stored_columns)), spec)
+        transferred, mode = len(data), 'full'
+
+    with open(cache_path + '.tmp', 'wb') as f:
+        pickle.dump({'version': _SYNC_CACHE_VERSION, 'data': data, 'high_water_mark': high_water_mark}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(cache_path + '.tmp', cache_path)
+
+    logging.info(f'[sql]: {spec.name}: {mode} sync, {transferred} rows transferred, {len(data)} rows cached '
+                 f'in {time.perf_counter() - start:.3f}s')
+    if spec.columns:
+        data = data[list(spec.columns)]
+    return data, transferred
+
+
+def auto_load_tables_from_sql(cached_dir, db_name, tables: Union[Dict[str, Dict[str, Callable]], List[TableSpec]],
+                              force_update=False, prefix: str = "",
+                              pool: Optional[ConnectionPool] = None) -> Dict[str, pd.DataFrame]:
+    """
+    like `auto_load_table_from_sql` for several tables, read in one session. a table is synced into its pickled
+    cache `<cache_name>.pkl` when it is updated or never cached, see `sync_table`. cached excel dumps are still read,
+    a dump of the whole table is filtered by the spec.
+
+    :param tables: the table specs, or table name -> converters of `pd.read_excel` for whole tables
+    :param pool: reads on this pool instead of the mysql pool of `db_name`, e.g. one of sqlite connections
+    """
+    if isinstance(tables, dict):
+        tables = [TableSpec(name, converters=converters) for name, converters in tables.items()]
+
+    def _path(name, ext='.xlsx'):
+        return os.path.join(cached_dir, name + ext)
+
+    os.makedirs(cached_dir, exist_ok=True)
+    res = {}
+    with SqlSession(db_name, pool) as session:
+        for spec in tables:
+            cache_path = _path(spec.cache_name, '.pkl')
+            cache = None if force_update else _read_sync_cache(cache_path)
+            if cache is not None:
+                print(f'[{prefix}]: Load {spec.name} from `{cache_path}`')
+                data = cache['data']
+                res[spec.name] = data[list(spec.columns)] if spec.columns else data
+            elif not force_update and os.path.exists(_path(spec.cache_name)):
+                print(f'[{prefix}]: Load {spec.name} from `{_path(spec.cache_name)}`')
+                res[spec.name] = pd.read_excel(_path(spec.cache_name), converters=spec.converters)
+            elif not force_update and os.path.exists(_path(spec.name)):
+                print(f'[{prefix}]: Load {spec.name} from `{_path(spec.name)}` (whole table)')
+                data = pd.read_excel(_path(spec.name), converters=spec.converters)
+                res[spec.name] = spec.apply(data).reset_index(drop=True)
+            else:
+                print(f'[{prefix}]: Syncing {spec.name} from sql ...')
+                res[spec.name], transferred = sync_table(session, spec, cache_path)
+                print(f'[{prefix}]: Sync {spec.name} finished, {transferred} rows transferred.')
+    return res
+
+
 def auto_load_table_from_sql_vanilla(cached_dir, db_name: str, sql: str, save_name=None,
                                      force_update=False, prefix: str = "", **kwargs) -> pd.DataFrame:
     if save_name is not None:
@@ -101,4 +633,3 @@ def auto_load_table_from_sql_vanilla(cached_dir, db_name: str, sql: str, save_na
         print(f'[{prefix}]: loading data from {excel_data_path} finished.')
 
     return data
-
@@ -0,0 +1,11 @@
+import pytest
+
+from knowsys.collection import knowsys_collection
+
+
+@pytest.fixture
+def collection():
+    # the knowsys types register in the global collection
+    knowsys_collection.clear()
+    yield knowsys_collection
+    knowsys_collection.clear()
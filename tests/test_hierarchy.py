@@ -0,0 +1,23 @@
+from knowsys.types import EntityType
+
+
+def test_parent_cycle(collection):
+    root = EntityType('root', 'root')
+    ca = EntityType('ca', 'ca', parent=root)
+    cb = EntityType('cb', 'cb', parent=ca)
+    child = EntityType('child', 'child', parent=cb)
+    ca.parent = cb
+
+    assert collection.is_belong_to(cb, ca)
+    assert collection.is_belong_to(ca, cb)
+    assert not collection.is_belong_to(ca, root)
+    assert collection.is_belong_to(child, ca)
+    assert not collection.is_belong_to_many(['ca', 'cb'], 'root').any()
+
+    assert collection.descendants_of(ca).list() == [cb, child]
+    assert collection.descendants_of(cb, include_self=True).list() == [cb, ca, child]
+    assert ca.flatten().list() == [ca, cb, child]
+    assert collection.query().subtree(ca).list() == [ca, cb, child]
+    assert collection._parent_cycles() == [collection.id_of(ca), collection.id_of(cb)]
+
+    assert root.flatten().list() == [root]
@@ -0,0 +1,12 @@
+from knowsys.matcher import TermMatcher
+from knowsys.types import EntityType, EntityTermType, EntityPropertyType
+
+
+def test_default_types(collection):
+    person = EntityType('person', 'person')
+    age = EntityPropertyType('age', 'age', '', None, person)
+    doctor = EntityTermType('doctor', 'doctor', '', None, person)
+
+    matcher = TermMatcher(collection)
+    assert matcher.match('the age of the doctor') == [((4, 7), (age,)), ((15, 21), (doctor,))]
+    assert TermMatcher(collection, types=EntityTermType).match('the age of the doctor') == [((15, 21), (doctor,))]
@@ -0,0 +1,33 @@
+import pytest
+
+from knowsys.enums import Direction
+from knowsys.snapshot import KnowsysSnapshot
+from knowsys.types import EntityType, EntityTermType, RelationType
+
+
+def test_bind(collection, tmp_path):
+    # the snapshot stores a missing english name as ''
+    person = EntityType('person', 'person', '')
+    doctor = EntityType('doctor', 'doctor', '', parent=person)
+    EntityTermType('surgeon', 'surgeon', '', None, doctor)
+    RelationType('cures', 'cures', '', None, (doctor, person), Direction.FORWARD)
+    expected = [item.saving_list() for item in collection]
+    path = str(tmp_path / 'knowsys.snapshot')
+    collection.save_snapshot(path)
+
+    unbound = KnowsysSnapshot.load(path)
+    assert unbound.get('doctor').saving_list() == doctor.saving_list()
+    with pytest.raises(ValueError):
+        unbound.get('person').flatten()
+    with pytest.raises(ValueError):
+        unbound.bind(collection)
+
+    collection.clear()
+    snapshot = KnowsysSnapshot.load(path)
+    snapshot.bind(collection)
+    assert [item.saving_list() for item in collection] == expected
+    doctor = collection.get('doctor')
+    assert snapshot.get('doctor') is doctor
+    assert [item.code for item in collection.get('person').flatten()] == ['person', 'doctor']
+    assert [item.code for item in doctor.terms()] == ['surgeon']
+    assert [item.code for item in doctor.relations_start_by()] == ['cures']
@@ -0,0 +1,51 @@
+import gc
+import sqlite3
+import weakref
+
+import pandas as pd
+
+from knowsys.global_config import configs
+from knowsys.utils.sql_loader import ConnectionPool, SqlSession, _concat_chunks
+
+
+def test_concat_chunks_releases_chunks():
+    released = []
+
+    def chunks():
+        refs = []
+        for i in range(5):
+            gc.collect()
+            # the chunks already taken are not held by the consumer
+            released.append(all(ref() is None for ref in refs))
+            chunk = pd.DataFrame({'code': [f'{i}-{j}' for j in range(3)], 'value': [i * 3 + j for j in range(3)]})
+            refs.append(weakref.ref(chunk))
+            yield chunk
+            del chunk
+
+    data = _concat_chunks(chunks())
+    assert all(released)
+    assert data['value'].tolist() == list(range(15))
+    assert data['code'].tolist()[:4] == ['0-0', '0-1', '0-2', '1-0']
+
+
+def test_concat_chunks_same_as_concat():
+    chunks = [pd.DataFrame.from_records([('a', 1, None), ('b', 2, 1.5)], columns=['code', 'count', 'score']),
+              pd.DataFrame.from_records([(None, None, None)], columns=['code', 'count', 'score'])]
+    pd.testing.assert_frame_equal(_concat_chunks(iter(chunks)), pd.concat(chunks, ignore_index=True))
+    empty = pd.DataFrame(columns=['code'])
+    pd.testing.assert_frame_equal(_concat_chunks([empty]), pd.concat([empty], ignore_index=True))
+
+
+def test_load_tables(tmp_path, monkeypatch):
+    # several chunks per table
+    monkeypatch.setitem(configs, 'KNOWSYS_SQL_CHUNK_SIZE', 1000)
+    path = str(tmp_path / 'tables.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('create table terms (code text, name text)')
+        conn.executemany('insert into terms values (?, ?)', [(f'{i:04d}', f'term {i}') for i in range(2500)])
+    pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), max_size=2, paramstyle='qmark')
+    with pool, SqlSession(pool=pool) as session:
+        terms, again = session.load_tables(['terms', 'terms'])
+        expected = session.read_sql('select * from terms')
+    pd.testing.assert_frame_equal(terms, expected)
+    pd.testing.assert_frame_equal(again, expected)
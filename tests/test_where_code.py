@@ -0,0 +1,8 @@
+from knowsys.types import EntityType
+
+
+def test_where_code_valid(collection):
+    malformed = EntityType('malformed', 'malformed')
+    assert collection.where_code().list() == []
+    assert collection.where_code(valid=True).list() == []
+    assert collection.where_code(valid=False).list() == [malformed]